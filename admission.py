@@ -0,0 +1,99 @@
+# ==============================================
+#  ADMISSION.PY - TCP connection limits and per-client rate limiting
+# ==============================================
+#
+# One misbehaving master (a 1 kHz HMI, a leaked connection pool) should not starve
+# the others sharing the server loop. AdmissionControl is consulted by the TCP
+# request handler (handlers.py):
+#   - maxConnections / maxPerIP: a connection over either limit is closed as soon
+#     as it is accepted
+#   - idleTimeout: connections with no traffic for that many seconds are closed
+#   - rateLimit / burst: a token bucket per client IP, shared by all of its
+#     connections (opening more does not raise the rate); a request arriving with
+#     the bucket empty is answered at once with exception 6 (DEVICE_BUSY) instead
+#     of being queued
+# rejected / reaped / throttled counters (and how many distinct client IPs were
+# throttled) appear in mb.metrics(). Serial ports have one master and are not limited.
+
+import time
+
+class AdmissionControl:
+    def __init__(self, maxConnections=None, maxPerIP=None, idleTimeout=None, rateLimit=None, burst=None):
+        self.maxConnections = maxConnections
+        self.maxPerIP = maxPerIP
+        self.idleTimeout = idleTimeout
+        self.rateLimit = rateLimit          # requests per second per client IP
+        # Bucket size; defaults to one second's worth, and never below one request
+        # (rateLimit=0.5 would otherwise never fill a token)
+        self.burst = max(1.0, burst or rateLimit) if rateLimit else burst
+        self.open = 0
+        self.perIP = {}                     # client IP → open connections
+        self.buckets = {}                   # client IP → token bucket
+        self.rejected = 0
+        self.reaped = 0
+        self.throttled = 0
+        self.throttledClients = set()
+
+    def settings(self):
+        return {"maxConnections": self.maxConnections, "maxPerIP": self.maxPerIP,
+                "idleTimeout": self.idleTimeout, "rateLimit": self.rateLimit, "burst": self.burst}
+
+    def admit(self, ip):
+        if self.maxConnections is not None and self.open >= self.maxConnections:
+            self.rejected += 1
+            return False
+        count = self.perIP.get(ip, 0)
+        if self.maxPerIP is not None and count >= self.maxPerIP:
+            self.rejected += 1
+            return False
+        self.open += 1
+        self.perIP[ip] = count + 1
+        return True
+
+    def release(self, ip):
+        self.open -= 1
+        count = self.perIP.get(ip, 1) - 1
+        if count:
+            self.perIP[ip] = count
+        else:
+            self.perIP.pop(ip, None)
+            self.pruneBuckets()
+
+    def bucketFor(self, ip):
+        # Shared by every connection from ip
+        bucket = self.buckets.get(ip)
+        if bucket is None:
+            bucket = self.buckets[ip] = [float(self.burst or 0), time.monotonic()]   # [tokens, last refill]
+        return bucket
+
+    def pruneBuckets(self):
+        # A disconnected client's bucket can go once it would have refilled anyway
+        if not self.rateLimit:
+            return
+        refill = self.burst / self.rateLimit
+        now = time.monotonic()
+        self.buckets = {ip: bucket for ip, bucket in self.buckets.items()
+                        if ip in self.perIP or now - bucket[1] < refill}
+
+    def allow(self, bucket, ip):
+        # Token bucket: refill for the time elapsed, spend one token per request
+        now = time.monotonic()
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rateLimit)
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            return True
+        bucket[0] = tokens
+        self.throttled += 1
+        self.throttledClients.add(ip)
+        return False
+
+    def stats(self):
+        return {
+            **self.settings(),
+            "openConnections": self.open,
+            "rejectedConnections": self.rejected,
+            "reapedConnections": self.reaped,
+            "throttledRequests": self.throttled,
+            "throttledClients": len(self.throttledClients),
+        }
@@ -0,0 +1,56 @@
+# ==============================================
+#  BENCHDATABLOCK.PY - register store micro-benchmark
+# ==============================================
+#
+# Compares the stock ModbusSequentialDataBlock with datablock.RegisterDataBlock
+# and datablock.SnapshotDataBlock: memory per map, 125-register block reads,
+# single FLOAT32 writes and full-map snapshot writes.
+#
+# Usage:
+#   python benchDatablock.py
+#   python benchDatablock.py --registers 65536 --repeat 20000
+
+import argparse
+import timeit
+import tracemalloc
+from array import array
+from pymodbus.datastore import ModbusSequentialDataBlock
+from datablock import RegisterDataBlock, SnapshotDataBlock
+
+parser = argparse.ArgumentParser(description="Register datablock micro-benchmark")
+parser.add_argument("--registers", type=int, default=20000, help="Registers per map (default 20000)")
+parser.add_argument("--repeat", type=int, default=10000, help="Iterations per timing (default 10000)")
+args = parser.parse_args()
+
+blocks = {
+    "ModbusSequentialDataBlock": lambda n: ModbusSequentialDataBlock(0, [0] * n),
+    "RegisterDataBlock": lambda n: RegisterDataBlock(0, n),
+    "SnapshotDataBlock": lambda n: SnapshotDataBlock(0, n),
+}
+
+def measureMemory(factory, count, image):
+    # Filled with distinct values: a list of zeros would share one int object
+    tracemalloc.start()
+    block = factory(count)
+    block.setValues(0, image)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del block
+    return size
+
+def perCall(stmt, repeat):
+    return min(timeit.repeat(stmt, number=repeat, repeat=3)) / repeat * 1e6
+
+count = args.registers
+fullImage = array('H', (i & 0xFFFF for i in range(count)))
+fullList = fullImage.tolist()
+print(f"\n=== DATABLOCK BENCH: {count} registers, {args.repeat} iterations ===")
+print(f"{'block':28s} {'memory':>10s} {'read125':>10s} {'write2':>10s} {'writeAll':>10s}")
+for name, factory in blocks.items():
+    block = factory(count)
+    image = fullList if name == "ModbusSequentialDataBlock" else fullImage
+    memory = measureMemory(factory, count, image)
+    read = perCall(lambda: block.getValues(1000, 125), args.repeat)
+    write = perCall(lambda: block.setValues(1000, [16656, 0]), args.repeat)
+    writeAll = perCall(lambda: block.setValues(0, image), max(args.repeat // 100, 10))
+    print(f"{name:28s} {memory / 1024:8.1f}KB {read:8.2f}us {write:8.2f}us {writeAll:8.1f}us")
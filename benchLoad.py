@@ -0,0 +1,347 @@
+# ==============================================
+#  BENCHLOAD.PY - MODBUSINATOR capacity benchmark
+# ==============================================
+#
+# Measures, on localhost:
+#   1. update() throughput per numParams and payload form (list, dict list,
+#      sparse dict, updateValues array)
+#   2. read requests/sec and p50/p99 latency for 1..200 concurrent TCP clients
+#      polling different block sizes
+#   3. the same reads while the server applies updates at high frequency
+#   4. serial RTU reads over a pty pair (POSIX with pyserial installed)
+#   5. data freshness: a client polls the freshness header (freshnessHeader=True)
+#      while the server updates, reporting update-to-visible latency and data age
+# The server runs in a child process so client load does not share its GIL.
+# Results are written as JSON so runs can be diffed across releases.
+#
+# Usage:
+#   python benchLoad.py                      # full run → bench_output.json
+#   python benchLoad.py --quick              # short smoke run
+#   python benchLoad.py --clients 1,50 --blocks 2,125 --updateHz 0,100
+#   python benchLoad.py --freshnessOnly --updateHz 10,100 --pollHz 500
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import struct
+import time
+from array import array
+from datetime import datetime, timezone
+
+parser = argparse.ArgumentParser(description="MODBUSINATOR load / throughput benchmark")
+parser.add_argument("--sizes", default="10,256,4096", help="numParams values for the update benchmark")
+parser.add_argument("--clients", default="1,10,50,200", help="Concurrent TCP client counts")
+parser.add_argument("--blocks", default="2,16,125", help="Registers per read request")
+parser.add_argument("--updateHz", default="0,100", help="Server update rates during read tests (0 = idle)")
+parser.add_argument("--duration", type=float, default=3.0, help="Seconds per measurement (default 3)")
+parser.add_argument("--port", type=int, default=5920, help="TCP port for the server under test")
+parser.add_argument("--readParams", type=int, default=4096, help="numParams of the server under test")
+parser.add_argument("--skipSerial", action="store_true", help="Skip the pty serial benchmark")
+parser.add_argument("--quick", action="store_true", help="Short run: 0.5s measurements, fewer combinations")
+parser.add_argument("--pollHz", type=float, default=200, help="Freshness header polls per second (default 200)")
+parser.add_argument("--freshnessOnly", action="store_true", help="Run only the freshness benchmark")
+parser.add_argument("--output", default="bench_output.json", help="JSON results file (default bench_output.json)")
+appName = "MODBUSINATOR Bench"  # keeps benchmark log lines out of the service log
+
+def percentile(sortedValues, fraction):
+    if not sortedValues:
+        return None
+    return sortedValues[min(len(sortedValues) - 1, int(fraction * len(sortedValues)))]
+
+def snapshots(numParams):
+    return [[round(random.uniform(0, 1000), 2) for _ in range(numParams)] for _ in range(2)]
+
+# ====================== 1. UPDATE THROUGHPUT =====================
+def timeCalls(call, payloads, seconds):
+    calls = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while True:
+        call(payloads[calls & 1])
+        calls += 1
+        now = time.perf_counter()
+        if now >= deadline:
+            return calls, now - started
+
+def benchUpdates(sizes, seconds):
+    from modbusinator import MODBUSINATOR
+    results = []
+    for numParams in sizes:
+        mb = MODBUSINATOR(numParams=numParams, appName=appName)
+        snaps = snapshots(numParams)
+        sparseCount = max(1, numParams // 10)
+        forms = {
+            "list": (mb.update, [json.dumps(s) for s in snaps]),
+            "dictList": (mb.update, [json.dumps([{"v": v} for v in s]) for s in snaps]),
+            "sparse10pct": (mb.update, [json.dumps({str(i): s[i] for i in range(0, numParams, numParams // sparseCount)}) for s in snaps]),
+            "updateValues": (mb.updateValues, [array('f', s) for s in snaps]),
+        }
+        for form, (call, payloads) in forms.items():
+            calls, elapsed = timeCalls(call, payloads, seconds)
+            results.append({
+                "numParams": numParams,
+                "form": form,
+                "updates": calls,
+                "updatesPerSec": round(calls / elapsed, 1),
+                "usPerUpdate": round(elapsed / calls * 1e6, 2),
+            })
+            print(f"update  numParams={numParams:5d} {form:12s} {calls / elapsed:10.1f}/s {elapsed / calls * 1e6:10.2f}us")
+    return results
+
+# ====================== SERVER UNDER TEST =====================
+def serveInChild(port, numParams, updateHz, comPort, ready, stop, freshnessHeader=False):
+    from modbusinator import MODBUSINATOR
+    # parity "N": a pty pair rejects parity settings
+    mb = MODBUSINATOR(numParams=numParams, port=port, host="127.0.0.1", parity="N", appName=appName,
+                      freshnessHeader=freshnessHeader)
+    mb.runServer()
+    if comPort:
+        mb.startSerial(comPort)
+    snaps = [json.dumps(s) for s in snapshots(numParams)]
+    mb.update(snaps[0])
+    ready.set()
+    n = 0
+    while not stop.is_set():
+        if updateHz > 0:
+            mb.update(snaps[n & 1])
+            n += 1
+            stop.wait(1 / updateHz)
+        else:
+            stop.wait(0.1)
+    mb.stop()
+
+class ServerProcess:
+    def __init__(self, port, numParams, updateHz=0, comPort=None, freshnessHeader=False):
+        self.ready = multiprocessing.Event()
+        self.stop = multiprocessing.Event()
+        self.process = multiprocessing.Process(
+            target=serveInChild, args=(port, numParams, updateHz, comPort, self.ready, self.stop, freshnessHeader),
+            daemon=True,
+        )
+
+    def __enter__(self):
+        self.process.start()
+        if not self.ready.wait(timeout=15):
+            raise RuntimeError("server under test did not start")
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.process.terminate()
+
+# ====================== 2/3. TCP READ LOAD =====================
+async def pollClient(port, address, count, deadline, latencies, errors):
+    # Minimal Modbus TCP client (FC3) so the load generator stays cheap.
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    tid = 0
+    try:
+        while time.perf_counter() < deadline:
+            tid = (tid + 1) & 0xFFFF
+            sent = time.perf_counter()
+            writer.write(struct.pack(">HHHBBHH", tid, 0, 6, 1, 3, address, count))
+            header = await reader.readexactly(9)
+            if header[7] & 0x80:
+                errors[0] += 1
+            else:
+                await reader.readexactly(header[8])
+            latencies.append(time.perf_counter() - sent)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        errors[0] += 1
+    finally:
+        writer.close()
+
+async def readLoad(port, clients, block, seconds, totalRegisters):
+    latencies = []
+    errors = [0]
+    deadline = time.perf_counter() + seconds
+    span = max(1, totalRegisters - block)
+    await asyncio.gather(*(
+        pollClient(port, (i * block) % span, block, deadline, latencies, errors) for i in range(clients)
+    ))
+    return latencies, errors[0]
+
+def benchReads(clientCounts, blocks, updateRates, seconds, port, numParams):
+    results = []
+    totalRegisters = numParams * 2
+    for updateHz in updateRates:
+        with ServerProcess(port, numParams, updateHz):
+            for clients in clientCounts:
+                for block in blocks:
+                    latencies, errors = asyncio.run(readLoad(port, clients, block, seconds, totalRegisters))
+                    latencies.sort()
+                    rps = len(latencies) / seconds
+                    p50, p99 = percentile(latencies, 0.50), percentile(latencies, 0.99)
+                    results.append({
+                        "transport": "TCP",
+                        "clients": clients,
+                        "block": block,
+                        "updateHz": updateHz,
+                        "requests": len(latencies),
+                        "errors": errors,
+                        "rps": round(rps, 1),
+                        "p50Ms": round(p50 * 1000, 3) if p50 is not None else None,
+                        "p99Ms": round(p99 * 1000, 3) if p99 is not None else None,
+                    })
+                    print(f"read    tcp clients={clients:3d} block={block:3d} updateHz={updateHz:4g} "
+                          f"{rps:9.1f} req/s p50={results[-1]['p50Ms']}ms p99={results[-1]['p99Ms']}ms errors={errors}")
+    return results
+
+# ====================== 4. SERIAL OVER PTY =====================
+def crc16(frame):
+    crc = 0xFFFF
+    for byte in frame:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return struct.pack("<H", crc)
+
+def benchSerial(blocks, seconds, port, numParams):
+    try:
+        import serial  # noqa: F401 - the server side needs pyserial
+        import pty
+        import select
+        import tty
+    except ImportError as e:
+        print(f"serial  skipped ({e})")
+        return [{"transport": "SERIAL", "skipped": str(e)}]
+    master, slave = pty.openpty()
+    tty.setraw(master)
+    comPort = os.ttyname(slave)
+    results = []
+    with ServerProcess(port, numParams, 0, comPort):
+        time.sleep(0.5)
+        for block in blocks:
+            request = struct.pack(">BBHH", 1, 3, 0, block)
+            request += crc16(request)
+            expected = 5 + 2 * block
+            latencies = []
+            errors = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                sent = time.perf_counter()
+                os.write(master, request)
+                received = b""
+                while len(received) < expected:
+                    if not select.select([master], [], [], 1.0)[0]:
+                        break
+                    received += os.read(master, expected - len(received))
+                if len(received) < expected:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - sent)
+            latencies.sort()
+            p50, p99 = percentile(latencies, 0.50), percentile(latencies, 0.99)
+            results.append({
+                "transport": "SERIAL",
+                "clients": 1,
+                "block": block,
+                "requests": len(latencies),
+                "errors": errors,
+                "rps": round(len(latencies) / seconds, 1),
+                "p50Ms": round(p50 * 1000, 3) if p50 is not None else None,
+                "p99Ms": round(p99 * 1000, 3) if p99 is not None else None,
+            })
+            print(f"read    pty block={block:3d} {results[-1]['rps']:9.1f} req/s p50={results[-1]['p50Ms']}ms errors={errors}")
+    os.close(master)
+    os.close(slave)
+    return results
+
+# ====================== 5. DATA FRESHNESS =====================
+async def pollFreshness(port, address, pollHz, seconds):
+    # FC3 reads of the header; latency = seen - published on every new sequence
+    from codec import decodeFreshness, freshnessRegisters
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    ages, latencies = [], []
+    lastSequence, missed, polls = None, 0, 0
+    deadline = time.perf_counter() + seconds
+    nextPoll = time.perf_counter()
+    try:
+        while time.perf_counter() < deadline:
+            writer.write(struct.pack(">HHHBBHH", polls & 0xFFFF, 0, 6, 1, 3, address, freshnessRegisters))
+            header = await reader.readexactly(9)
+            if header[7] & 0x80:
+                raise RuntimeError(f"freshness header read failed (exception {header[8]})")
+            body = await reader.readexactly(header[8])
+            seen = time.time()
+            polls += 1
+            sequence, timestamp, _ = decodeFreshness(array('H', struct.unpack(f">{freshnessRegisters}H", body)))
+            ages.append(seen - timestamp)
+            if lastSequence is not None and sequence != lastSequence:
+                latencies.append(seen - timestamp)
+                missed += sequence - lastSequence - 1
+            lastSequence = sequence
+            nextPoll += 1 / pollHz
+            await asyncio.sleep(max(0.0, nextPoll - time.perf_counter()))
+    finally:
+        writer.close()
+    return ages, latencies, missed, polls
+
+def benchFreshness(updateRates, pollHz, seconds, port, numParams):
+    from metrics import diagnosticRegisters
+    address = numParams * 2 + diagnosticRegisters   # default layout: header after the diagnostics
+    results = []
+    for updateHz in [hz for hz in updateRates if hz > 0] or [100]:
+        with ServerProcess(port, numParams, updateHz, freshnessHeader=True):
+            ages, latencies, missed, polls = asyncio.run(pollFreshness(port, address, pollHz, seconds))
+        ages.sort()
+        latencies.sort()
+        ms = lambda v: round(v * 1000, 3) if v is not None else None
+        results.append({
+            "updateHz": updateHz,
+            "pollHz": pollHz,
+            "polls": polls,
+            "updatesSeen": len(latencies),
+            "missed": missed,
+            "latencyP50Ms": ms(percentile(latencies, 0.50)),
+            "latencyP99Ms": ms(percentile(latencies, 0.99)),
+            "latencyMaxMs": ms(latencies[-1] if latencies else None),
+            "ageP50Ms": ms(percentile(ages, 0.50)),
+            "ageP99Ms": ms(percentile(ages, 0.99)),
+            "ageMaxMs": ms(ages[-1] if ages else None),
+        })
+        r = results[-1]
+        print(f"fresh   updateHz={updateHz:4g} pollHz={pollHz:g} seen={r['updatesSeen']} missed={missed} "
+              f"latency p50={r['latencyP50Ms']}ms p99={r['latencyP99Ms']}ms age p50={r['ageP50Ms']}ms p99={r['ageP99Ms']}ms")
+    return results
+
+def main():
+    args = parser.parse_args()
+    asInts = lambda text: [int(float(n)) for n in text.split(",") if n]
+    sizes, clients, blocks, updateRates = asInts(args.sizes), asInts(args.clients), asInts(args.blocks), asInts(args.updateHz)
+    seconds = args.duration
+    if args.quick:
+        seconds = 0.5
+        clients, blocks = clients[:2], blocks[::2]
+    if max(blocks) > 125:
+        parser.error("--blocks must be <= 125 registers")
+    if args.pollHz <= 0:
+        parser.error("--pollHz must be positive")
+
+    import pymodbus
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pymodbus": pymodbus.__version__,
+            "durationPerTest": seconds,
+        },
+    }
+    if not args.freshnessOnly:
+        report["updates"] = benchUpdates(sizes, seconds)
+        report["reads"] = benchReads(clients, blocks, updateRates, seconds, args.port, args.readParams)
+        if not args.skipSerial and os.name == "posix":
+            report["reads"] += benchSerial(blocks, seconds, args.port + 1, args.readParams)
+    report["freshness"] = benchFreshness(updateRates, args.pollHz, seconds, args.port + 2, args.readParams)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# ==============================================
+#  BENCHSTARTUP.PY - import / cold start benchmark
+# ==============================================
+#
+# DUMPER is launched over and over from scripts and the server restarts with its
+# service, so interpreter start + imports are part of every run. Each measurement
+# is a fresh interpreter (median of --runs):
+#   1. import time of modbusinator, modbusDUMPER and codec against bare python
+#   2. modules that must stay lazy: importing modbusinator / modbusDUMPER must not
+#      load the pymodbus server or client packages, pyserial, multiprocessing or
+#      http.server (they load when that transport / feature starts)
+#   3. modbusDUMPER --help and one scan of a local server, start to exit
+#   4. MODBUSINATOR start to TCP listening, cold and warm (imagePath) restart
+# --maxImportMs turns the import times into a budget: exit status 1 when exceeded
+# or when a lazy module is imported eagerly, so CI catches a heavy top-level import.
+#
+# Usage:
+#   python benchStartup.py
+#   python benchStartup.py --runs 20 --maxImportMs 150 --output bench_startup.json
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+parser = argparse.ArgumentParser(description="MODBUSINATOR / DUMPER startup benchmark")
+parser.add_argument("--runs", type=int, default=9, help="Fresh interpreters per measurement (default 9)")
+parser.add_argument("--numParams", type=int, default=4096, help="numParams of the server under test (default 4096)")
+parser.add_argument("--port", type=int, default=5930, help="TCP port for the server under test")
+parser.add_argument("--maxImportMs", type=float, default=None, help="Fail if an import takes longer (median, ms)")
+parser.add_argument("--output", default="bench_startup.json", help="JSON results file (default bench_startup.json)")
+
+here = os.path.dirname(os.path.abspath(__file__))
+lazyModules = ("pymodbus.server", "pymodbus.client", "serial", "multiprocessing", "http.server")
+appName = "MODBUSINATOR Bench"  # keeps benchmark log lines out of the service log
+
+def timeRuns(command, runs):
+    # Median wall time of a fresh process, in ms
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=here, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - started)
+    return round(statistics.median(times) * 1000, 1)
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+# ====================== 1/2. IMPORTS =====================
+def benchImports(runs):
+    results = {"python": timeRuns(python("pass"), runs)}
+    for module in ("codec", "modbusinator", "modbusDUMPER"):
+        results[module] = timeRuns(python(f"import {module}"), runs)
+        print(f"import  {module:14s} {results[module]:7.1f} ms (bare python {results['python']} ms)")
+    return results
+
+def eagerModules(module):
+    # Lazy modules that importing module pulls in anyway
+    probe = f"import sys, {module}; print(','.join(m for m in {lazyModules!r} if m in sys.modules))"
+    output = subprocess.run(python(probe), cwd=here, capture_output=True, text=True, check=True).stdout.strip()
+    return output.split(",") if output else []
+
+# ====================== 3/4. STARTUP =====================
+def serveUntilReady(port, numParams, imagePath):
+    # Child body: construct + runServer, report the time to listening, stop
+    return (f"import time; started = time.perf_counter()\n"
+            f"from modbusinator import MODBUSINATOR\n"
+            f"mb = MODBUSINATOR(numParams={numParams}, port={port}, host='127.0.0.1', appName={appName!r}, "
+            f"imagePath={imagePath!r})\n"
+            f"mb.runServer()\n"
+            f"print(round((time.perf_counter() - started) * 1000, 1), flush=True)\n"
+            f"import sys; sys.stdin.read()\n"
+            f"mb.stop()\n")
+
+def startServer(port, numParams, imagePath=None):
+    process = subprocess.Popen(python(serveUntilReady(port, numParams, imagePath)), cwd=here, text=True,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    listening = float(process.stdout.readline())
+    return process, listening
+
+def stopServer(process):
+    process.stdin.close()
+    process.wait(timeout=10)
+
+def benchServerStart(runs, port, numParams):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        imagePath = os.path.join(directory, "registers.img")
+        for name, path in (("cold", None), ("imageCreate", imagePath), ("imageWarm", imagePath)):
+            times = []
+            for _ in range(runs):
+                if name == "imageCreate" and os.path.exists(imagePath):
+                    os.remove(imagePath)
+                process, listening = startServer(port, numParams, path)
+                stopServer(process)
+                times.append(listening)
+            results[name] = round(statistics.median(times), 1)
+            print(f"server  {name:14s} {results[name]:7.1f} ms to TCP listening (in-process, numParams={numParams})")
+    return results
+
+def benchDumper(runs, port, numParams):
+    dumper = [sys.executable, "modbusDUMPER.py"]
+    results = {"help": timeRuns(dumper + ["--help"], runs)}
+    print(f"dumper  {'--help':14s} {results['help']:7.1f} ms")
+    process, _ = startServer(port, numParams)
+    try:
+        results["scan"] = timeRuns(dumper + ["--port", str(port), "--numParams", "16"], runs)
+    finally:
+        stopServer(process)
+    print(f"dumper  {'scan 16 params':14s} {results['scan']:7.1f} ms start to exit")
+    return results
+
+def main():
+    args = parser.parse_args()
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+    imports = benchImports(args.runs)
+    eager = {module: eagerModules(module) for module in ("modbusinator", "modbusDUMPER")}
+    for module, loaded in eager.items():
+        print(f"lazy    {module:14s} {'ok' if not loaded else 'EAGER: ' + ', '.join(loaded)}")
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+        },
+        "importMs": imports,
+        "eagerModules": eager,
+        "dumperMs": benchDumper(args.runs, args.port, args.numParams),
+        "serverMs": benchServerStart(args.runs, args.port, args.numParams),
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    failures = [f"{module} has eager imports" for module, loaded in eager.items() if loaded]
+    if args.maxImportMs is not None:
+        failures += [f"import {module} {ms} ms > {args.maxImportMs:g} ms"
+                     for module, ms in imports.items() if module != "python" and ms > args.maxImportMs]
+    for failure in failures:
+        print(f"FAIL    {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
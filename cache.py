@@ -0,0 +1,130 @@
+# ==============================================
+#  CACHE.PY - encoded read-response cache for MODBUSINATOR
+# ==============================================
+#
+# SCADA masters poll the same few ranges over and over, and between two updates
+# every answer is byte-for-byte the same. ResponseCache keeps the encoded response
+# PDU (function code + byte count + registers) keyed by
+# (unit, function code, address, count); a hit is re-framed with the request's
+# transaction id (TCP) or CRC (RTU) and sent without touching the datablock.
+#
+#   - bounded, least-recently-used entries are evicted first
+#   - watch(datablock, functionCode, unit) invalidates only entries overlapping
+#     the register spans each publish actually wrote
+#   - hits / misses / evictions / invalidations are counted for mb.metrics()
+#
+# A generation counter closes the race between a miss being encoded on the
+# server loop and an update publishing on another thread: a response read before
+# the publish is never stored after it.
+
+import sys
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from threading import Lock
+
+cachedFunctions = (3, 4)  # read holding / input registers
+
+def registersPayload(functionCode, registers):
+    # Response PDU bytes for FC3/FC4: [fc][byte count][big-endian registers...]
+    regs = array('H', registers)
+    if sys.byteorder == 'little':
+        regs.byteswap()
+    return bytes((functionCode, 2 * len(regs))) + regs.tobytes()
+
+def mergeSpans(spans):
+    # Sorted, non-overlapping [(start, stop), ...]
+    merged = []
+    for start, stop in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            if stop > merged[-1][1]:
+                merged[-1] = (merged[-1][0], stop)
+        else:
+            merged.append((start, stop))
+    return merged
+
+class ResponseCache:
+    def __init__(self, maxEntries=1024):
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()  # (unit, fc, address, count) → response PDU bytes
+        self.lock = Lock()            # server loops and update threads share the cache
+        self.generation = 0           # bumped by every invalidation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def keyFor(pdu):
+        # None for anything that is not a cacheable unicast read
+        if pdu.function_code not in cachedFunctions or not pdu.dev_id:
+            return None
+        return (pdu.dev_id, pdu.function_code, pdu.address, pdu.count)
+
+    def get(self, key):
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload, generation):
+        # generation = self.generation sampled before the datablock was read
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[key] = payload
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, functionCode, spans, unit=None):
+        # spans = [(start, stop), ...] in request addresses; drops overlapping entries
+        # (of one unit ID, or of every unit when unit is None).
+        spans = mergeSpans(spans)
+        if not spans:
+            return
+        starts = [start for start, _ in spans]
+        with self.lock:
+            self.generation += 1
+            stale = []
+            for key in self.entries:
+                fc, address = key[1], key[2]
+                if fc != functionCode or (unit is not None and key[0] != unit):
+                    continue
+                # last span starting before this entry ends; overlap if it ends after we start
+                n = bisect_right(starts, address + key[3] - 1)
+                if n and spans[n - 1][1] > address:
+                    stale.append(key)
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+
+    def watch(self, datablock, functionCode, unit=None):
+        # Invalidate on every publish of a SnapshotDataBlock serving functionCode.
+        # ModbusDeviceContext addresses datablocks one-based, hence the - 1.
+        datablock.watchers.append(
+            lambda spans: self.invalidate(functionCode, [(start - 1, stop - 1) for start, stop in spans], unit)
+        )
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "maxEntries": self.maxEntries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,307 @@
+# ==============================================
+#  CODEC.PY - register block decoding and encoding
+# ==============================================
+#
+# Decodes a whole block of 16-bit registers in one pass with array byteswaps,
+# instead of unpacking one value at a time. Shared by modbusDUMPER, tester and
+# any other tool that reads MODBUSINATOR-style register maps:
+#
+#   from codec import decodeRegisters
+#   decodeRegisters(result.registers, "FLOAT32", "CDAB")
+#   decodeRegisters(regs, "FLOAT32", stride=3)   # one value every 3 registers
+#
+# RegisterMap is the server-side counterpart for maps that are not all ABCD FLOAT32:
+# a per-parameter schema (type, byte order, scale/offset, address) compiled once
+# into a struct format and a byte offset table, see below.
+#
+# asFloat / sparseChanges normalize update payloads (MODBUSINATOR.update and the
+# ingest sources share them).
+#
+# encodeFreshness / decodeFreshness handle the freshness header MODBUSINATOR can
+# publish with every update (freshnessHeader=True): four UINT32 ABCD values
+#   sequence, epoch seconds, microseconds, update duration in microseconds
+
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from operator import itemgetter
+
+# regCount = how many 16-bit registers this type consumes
+# is32bit  = whether byteOrder applies
+typeInfo = {
+    "INT16":   {"regCount": 1, "is32bit": False},
+    "UINT16":  {"regCount": 1, "is32bit": False},
+    "INT32":   {"regCount": 2, "is32bit": True},
+    "UINT32":  {"regCount": 2, "is32bit": True},
+    "FLOAT32": {"regCount": 2, "is32bit": True},
+}
+byteOrders = ("ABCD", "CDAB", "BADC", "DCBA")
+
+int32Code = 'i' if array('i').itemsize == 4 else 'l'
+uint32Code = int32Code.upper()
+typeCodes = {"INT16": 'h', "UINT16": 'H', "INT32": int32Code, "UINT32": uint32Code, "FLOAT32": 'f'}
+structCodes = {"INT16": 'h', "UINT16": 'H', "INT32": 'i', "UINT32": 'I', "FLOAT32": 'f'}  # '>' standard sizes
+floatMax = 3.4028234663852886e38
+typeLimits = {
+    "INT16": (-0x8000, 0x7FFF), "UINT16": (0, 0xFFFF),
+    "INT32": (-0x80000000, 0x7FFFFFFF), "UINT32": (0, 0xFFFFFFFF),
+    "FLOAT32": (-floatMax, floatMax),
+}
+freshnessRegisters = 8
+freshnessFormat = struct.Struct(">IIII")
+# Register bytes as positions in the big-endian (A B C D) value; 16-bit types ignore byteOrder
+bytePositions = {"ABCD": (0, 1, 2, 3), "CDAB": (2, 3, 0, 1), "BADC": (1, 0, 3, 2), "DCBA": (3, 2, 1, 0)}
+
+def asFloat(raw):
+    # Normalize one payload value; None means blank/invalid → skip this position.
+    # Treat "", whitespace-only strings, or None as blank
+    if raw is None or (isinstance(raw, str) and raw.strip() == ""):
+        return None
+    # Convert to float safely; values that fail conversion or cannot be
+    # represented as FLOAT32 are invalid
+    try:
+        val = float(raw)
+    except (TypeError, ValueError):
+        return None
+    if floatMax < abs(val) < float('inf'):
+        return None
+    return val
+
+def sparseChanges(payload):
+    # {index: value} for sparse payloads ({"12": 25.3} or [{"i": 12, "v": 25.3}]),
+    # None for the positional forms.
+    if isinstance(payload, dict):
+        if "i" in payload:
+            return {payload["i"]: payload.get("v")}
+        if payload and "v" not in payload:
+            return payload
+        return None
+    if isinstance(payload, list) and payload and isinstance(payload[0], dict) and "i" in payload[0]:
+        return {item.get("i"): item.get("v") for item in payload if isinstance(item, dict)}
+    return None
+
+def selectRegisters(regs, regCount, stride):
+    # Keep the first regCount registers of every stride-sized slot (drops padding).
+    count = len(regs) // stride
+    if stride == regCount:
+        return regs[:count * stride]
+    picked = array('H', bytes(2 * count * regCount))
+    for n in range(regCount):
+        picked[n::regCount] = regs[n:count * stride:stride]
+    return picked
+
+def decodeRegisters(registers, dataType="FLOAT32", byteOrder="ABCD", stride=None):
+    """Decode a register block into a list of values of dataType.
+
+    registers is any iterable of 16-bit ints (list, array('H'), pymodbus result.registers).
+    byteOrder applies to 32-bit types only. stride is the register spacing between
+    values (default: the type's own width); trailing registers that do not fill a
+    whole slot are ignored.
+    """
+    info = typeInfo[dataType]
+    regCount = info["regCount"]
+    regs = selectRegisters(array('H', registers), regCount, stride or regCount)
+    if not info["is32bit"]:
+        if dataType == "UINT16":
+            return regs.tolist()
+        values = array('h')
+        values.frombytes(memoryview(regs).cast('B'))  # same bits, signed view
+        return values.tolist()
+
+    if byteOrder not in byteOrders:
+        raise ValueError(f"Unknown byteOrder {byteOrder!r}; expected one of {list(byteOrders)}")
+    if byteOrder in ("CDAB", "DCBA"):
+        regs[0::2], regs[1::2] = regs[1::2], regs[0::2]  # word swap → ABCD / BADC
+    # Lay the bytes out big-endian (A B C D) in memory: ABCD registers are hi-byte
+    # first, BADC registers are lo-byte first.
+    if (byteOrder in ("ABCD", "CDAB")) == (sys.byteorder == 'little'):
+        regs.byteswap()
+    values = array(typeCodes[dataType])
+    values.frombytes(memoryview(regs).cast('B'))
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values.tolist()
+
+def encodeFreshness(sequence, timestamp, duration):
+    # → freshnessRegisters registers; duration in seconds (saturates at ~71 minutes)
+    seconds = int(timestamp)
+    micros = min(int((timestamp - seconds) * 1e6), 999999)
+    data = freshnessFormat.pack(sequence & 0xFFFFFFFF, seconds, micros, min(int(duration * 1e6), 0xFFFFFFFF))
+    return bigEndianRegisters(data)
+
+def decodeFreshness(registers):
+    # → (sequence, epoch timestamp, update duration in seconds)
+    sequence, seconds, micros, duration = freshnessFormat.unpack(bigEndianBytes(array('H', registers[:freshnessRegisters])))
+    return sequence, seconds + micros / 1e6, duration / 1e6
+
+def bigEndianBytes(regs):
+    # array('H') → its registers as big-endian bytes (hi, lo, hi, lo, ...)
+    if sys.byteorder == 'little':
+        regs = array('H', regs)
+        regs.byteswap()
+    return memoryview(regs).cast('B')
+
+def bigEndianRegisters(data):
+    regs = array('H')
+    regs.frombytes(data)
+    if sys.byteorder == 'little':
+        regs.byteswap()
+    return regs
+
+def picker(indices, count):
+    # Fast "values at indices" for a fixed index list (itemgetter, minus its quirks)
+    if indices == list(range(count)):
+        return lambda values: values
+    if len(indices) == 1:
+        n = indices[0]
+        return lambda values: (values[n],)
+    if not indices:
+        return lambda values: ()
+    return itemgetter(*indices)
+
+class RegisterMap:
+    """Per-parameter register layout, compiled once.
+
+    schema is one entry per parameter (list index = parameter index), each a dict
+    with any of "type" (INT16, UINT16, INT32, UINT32, FLOAT32; default FLOAT32),
+    "byteOrder" (ABCD, CDAB, BADC, DCBA; 32-bit types only), "scale" and "offset"
+    (value = raw * scale + offset) and "address" (register; default right after the
+    previous parameter). A bare type string is shorthand for {"type": ...}.
+
+    encode() packs the values big-endian in two vectorized pieces, plain FLOAT32
+    parameters (scale 1, offset 0) through one array('f') and all others through
+    one precompiled struct after a single scaling pass, then gathers the register
+    image from those bytes and the current image with one precomputed byte offset
+    table: byte order, addresses and untouched registers are all resolved at
+    compile time. Values outside a type's range saturate.
+    """
+
+    def __init__(self, schema):
+        self.types = []
+        self.addresses = []
+        self.widths = []
+        self.rows = []                  # (1/scale, -offset/scale, low, high, convert) per parameter
+        self.scales = []
+        self.offsets = []
+        positions = []
+        address = 0
+        for n, entry in enumerate(schema):
+            if isinstance(entry, str):
+                entry = {"type": entry}
+            dataType = str(entry.get("type", "FLOAT32")).upper()
+            byteOrder = str(entry.get("byteOrder", "ABCD")).upper()
+            if dataType not in typeInfo:
+                raise ValueError(f"parameter {n}: unknown type {dataType!r}; expected one of {list(typeInfo)}")
+            if byteOrder not in byteOrders:
+                raise ValueError(f"parameter {n}: unknown byteOrder {byteOrder!r}; expected one of {list(byteOrders)}")
+            scale = float(entry.get("scale", 1.0))
+            offset = float(entry.get("offset", 0.0))
+            if scale == 0:
+                raise ValueError(f"parameter {n}: scale must not be 0")
+            address = int(entry.get("address", address))
+            width = typeInfo[dataType]["regCount"]
+            if address < 0:
+                raise ValueError(f"parameter {n}: negative address {address}")
+            low, high = typeLimits[dataType]
+            self.types.append(dataType)
+            self.addresses.append(address)
+            self.widths.append(width)
+            self.scales.append(scale)
+            self.offsets.append(offset)
+            self.rows.append((1.0 / scale, -offset / scale, low, high, float if dataType == "FLOAT32" else round))
+            positions.append(bytePositions[byteOrder] if width == 2 else (0, 1))
+            address += width
+        if not self.types:
+            raise ValueError("register map has no parameters")
+        self.numParams = len(self.types)
+        self.registers = max(a + w for a, w in zip(self.addresses, self.widths))
+
+        byAddress = sorted(range(self.numParams), key=self.addresses.__getitem__)
+        for previous, n in zip(byAddress, byAddress[1:]):
+            if self.addresses[n] < self.addresses[previous] + self.widths[previous]:
+                raise ValueError(f"parameters {previous} and {n} overlap at register {self.addresses[n]}")
+        self.order = byAddress                              # parameter indices by address
+        self.integral = frozenset(n for n in range(self.numParams) if self.types[n] != "FLOAT32")  # NaN → blank
+        self.starts = [self.addresses[n] for n in byAddress]
+
+        plain = [n for n in range(self.numParams)
+                 if self.types[n] == "FLOAT32" and self.scales[n] == 1 and self.offsets[n] == 0]
+        plainSet = set(plain)
+        scaled = [n for n in range(self.numParams) if n not in plainSet]
+        self.plain = picker(plain, self.numParams)
+        self.scaled = [(n, *self.rows[n]) for n in scaled]
+        self.packer = struct.Struct(">" + "".join(structCodes[self.types[n]] for n in scaled))
+
+        # Offset table: image byte j ← byte gather[j] of
+        # (plain floats ‖ scaled values ‖ current image), all big-endian
+        packedSize = 4 * len(plain) + self.packer.size
+        gather = list(range(packedSize, packedSize + 2 * self.registers))
+        offset = 0
+        for n in plain + scaled:
+            address = self.addresses[n]
+            for k, source in enumerate(positions[n]):
+                gather[2 * address + k] = offset + source
+            offset += 2 * self.widths[n]
+        self.gather = itemgetter(*gather)
+        self.positions = positions
+
+    def pack(self, values):
+        floats = array('f', self.plain(values))
+        total = sum(floats)
+        if total != total or abs(total) == float('inf'):
+            # Something overflowed to inf (or was inf / NaN): saturate like the scaled types
+            floats = array('f', (min(max(v, -floatMax), floatMax) for v in self.plain(values)))
+        if sys.byteorder == 'little':
+            floats.byteswap()
+        raw = [convert(min(max(values[n] * k + c, low), high)) for n, k, c, low, high, convert in self.scaled]
+        return floats.tobytes() + self.packer.pack(*raw)
+
+    def encode(self, values, blanks, current):
+        """Register image (array('H'), self.registers long) for values[i] per parameter.
+
+        Parameters listed in blanks, those past len(values), and registers no
+        parameter uses keep their contents from current. NaN has no integer
+        encoding: list NaN values of the self.integral parameters in blanks.
+        """
+        count = len(values)
+        if count < self.numParams or blanks:
+            values = list(values[:self.numParams])
+            values.extend(self.offsets[count:])
+            for i in blanks:
+                values[i] = self.offsets[i]         # raw 0, restored from current below
+        image = bigEndianRegisters(bytes(self.gather(self.pack(values) + bigEndianBytes(current).tobytes())))
+        for i in (*blanks, *range(count, self.numParams)):
+            start = self.addresses[i]
+            image[start:start + self.widths[i]] = current[start:start + self.widths[i]]
+        return image
+
+    def encodeEach(self, indices, values):
+        # Sparse form: [(address, array('H') registers), ...] in indices order
+        raw = [convert(min(max(v * k + c, low), high))
+               for v, (k, c, low, high, convert) in zip(values, (self.rows[i] for i in indices))]
+        encoded = []
+        for i, r in zip(indices, raw):
+            data = struct.pack(">" + structCodes[self.types[i]], r)
+            encoded.append((self.addresses[i], bigEndianRegisters(bytes(data[j] for j in self.positions[i]))))
+        return encoded
+
+    def overlapping(self, low, high):
+        # Parameter indices with a register in [low, high)
+        n = max(bisect_right(self.starts, low) - 1, 0)
+        found = []
+        for start, i in zip(self.starts[n:], self.order[n:]):
+            if start >= high:
+                break
+            if start + self.widths[i] > low:
+                found.append(i)
+        return found
+
+    def decode(self, i, registers):
+        # One parameter's registers (in register order) → engineering value
+        data = bigEndianBytes(array('H', registers))
+        value = bytearray(len(data))
+        for k, source in enumerate(self.positions[i]):
+            value[source] = data[k]
+        raw = struct.unpack(">" + structCodes[self.types[i]], value)[0]
+        return raw * self.scales[i] + self.offsets[i]
@@ -0,0 +1,210 @@
+# ==============================================
+#  DATABLOCK.PY - register stores for MODBUSINATOR
+# ==============================================
+#
+# RegisterDataBlock is a compact drop-in for ModbusSequentialDataBlock: one
+# array('H') (2 bytes per register instead of a list of int objects). Writes go
+# through a memoryview and a block read is one C-level copy returned as an
+# array('H'), which pymodbus encodes like a list.
+#
+# SnapshotDataBlock adds double buffering and publishes every write as a whole
+# snapshot:
+#   - readers (the TCP / serial event loops) slice the front buffer and never lock
+#   - writers (update(), client FC6/FC16) build the next snapshot in the back buffer
+#     and publish it with a single reference swap
+#   - every swap bumps a generation counter; with two buffers, the publish after
+#     next rebuilds the buffer a preempted reader may still be slicing, so a reader
+#     that sees the generation move while it reads retries (seqlock style)
+# A FLOAT32 spread over two registers, or a 125-register block read, therefore
+# always comes from one snapshot — never half of update N and half of N+1.
+# Callables in watchers are told which (start, stop) address spans each publish
+# wrote, right after the swap and still under the writer lock, so the front buffer
+# they may copy from cannot be rewritten meanwhile (response cache invalidation,
+# shared-memory mirroring for worker processes).
+#
+# MappedSnapshotDataBlock is the same double buffer over two caller-provided
+# buffers (halves of a memory-mapped file, see persist.py), so the registers
+# outlive the process.
+#
+# SparseDataBlock serves several of these at their own addresses in one bank and
+# allocates nothing for the gaps (or for a bank with no blocks at all); reads or
+# writes that leave a populated range get ILLEGAL_ADDRESS.
+#
+# All plug into ModbusDeviceContext unchanged; benchDatablock.py compares them
+# with the stock block.
+
+from array import array
+from bisect import bisect_right
+from threading import Lock
+from pymodbus.constants import ExcCodes
+from pymodbus.datastore.store import BaseModbusDataBlock
+
+def asRegisters(values):
+    # array('H') passes straight through; lists/ints are packed once
+    if isinstance(values, array) and values.typecode == 'H':
+        return values
+    if isinstance(values, int):
+        values = [values]
+    return array('H', values)
+
+class RegisterDataBlock(BaseModbusDataBlock):
+    def __init__(self, address, count, default=0):
+        self.address = address
+        self.default_value = default
+        self.view = memoryview(array('H', [default]) * count)
+
+    @property
+    def values(self):
+        return self.view.obj
+
+    def getValues(self, address, count=1):
+        view = self.view  # one reference read → one consistent buffer
+        start = address - self.address
+        if start < 0 or len(view) < start + count:
+            return ExcCodes.ILLEGAL_ADDRESS
+        return view.obj[start:start + count]
+
+    def setValues(self, address, values):
+        regs = asRegisters(values)
+        start = address - self.address
+        if start < 0 or len(self.view) < start + len(regs):
+            return ExcCodes.ILLEGAL_ADDRESS
+        self.view[start:start + len(regs)] = regs
+        return None
+
+    def reset(self):
+        self.view[:] = array('H', [self.default_value]) * len(self.view)
+
+class SnapshotDataBlock(RegisterDataBlock):
+    def __init__(self, address, count, default=0):
+        super().__init__(address, count, default)   # self.view: the published front buffer
+        self.backView = memoryview(array('H', [default]) * count)  # where the next snapshot is built
+        self.lastWrites = []              # (start, stop) spans the back buffer is missing
+        self.writeLock = Lock()           # serializes writers only; readers never take it
+        self.watchers = []                # called with [(start, stop), ...] after each publish
+        self.frontIndex = 0               # which of the two buffers is published (0/1)
+        self.generation = 0               # publishes so far, bumped right after each swap
+
+    @property
+    def values(self):
+        return self.getValues(self.address, len(self.view))
+
+    def getValues(self, address, count=1):
+        start = address - self.address
+        if start < 0 or len(self.view) < start + count:
+            return ExcCodes.ILLEGAL_ADDRESS
+        while True:
+            generation = self.generation
+            regs = self.view.obj[start:start + count]
+            if self.generation == generation:
+                return regs
+
+    def setValues(self, address, values):
+        return self.publish([(address, values)])
+
+    def publish(self, writes):
+        # writes = [(address, registers), ...] applied together as one snapshot.
+        spans = []
+        size = len(self.view)
+        for address, values in writes:
+            regs = asRegisters(values)
+            start = address - self.address
+            stop = start + len(regs)
+            if start < 0 or size < stop:
+                return ExcCodes.ILLEGAL_ADDRESS
+            spans.append((start, stop, regs))
+        with self.writeLock:
+            front, back = self.view, self.backView
+            # The back buffer is the previous front: it only lacks the last publish.
+            for start, stop in self.lastWrites:
+                back[start:stop] = front[start:stop]
+            for start, stop, regs in spans:
+                back[start:stop] = regs
+            self.view, self.backView = back, front
+            self.frontIndex ^= 1
+            self.generation += 1
+            self.lastWrites = [(start, stop) for start, stop, _ in spans]
+            if self.watchers:
+                published = [(start + self.address, stop + self.address) for start, stop, _ in spans]
+                for watcher in self.watchers:
+                    watcher(published)
+        return None
+
+    def reset(self):
+        self.publish([(self.address, array('H', [self.default_value]) * len(self.view))])
+
+class MappedSnapshotDataBlock(SnapshotDataBlock):
+    def __init__(self, address, front, back, frontIndex=0):
+        # front / back: memoryviews of 'H' over the caller's buffers; nothing is copied
+        self.address = address
+        self.default_value = 0
+        self.view = front
+        self.backView = back
+        self.lastWrites = [(0, len(front))]  # back buffer may be any older snapshot
+        self.writeLock = Lock()
+        self.watchers = []
+        self.frontIndex = frontIndex
+        self.generation = 0
+
+    def getValues(self, address, count=1):
+        start = address - self.address
+        if start < 0 or len(self.view) < start + count:
+            return ExcCodes.ILLEGAL_ADDRESS
+        while True:
+            generation = self.generation
+            regs = array('H')
+            regs.frombytes(self.view[start:start + count].cast('B'))
+            if self.generation == generation:
+                return regs
+
+class SparseDataBlock(BaseModbusDataBlock):
+    def __init__(self, blocks=(), default=0):
+        self.blocks = sorted(blocks, key=lambda block: block.address)
+        self.starts = [block.address for block in self.blocks]
+        self.address = self.starts[0] if self.starts else 0
+        self.default_value = default
+
+    @property
+    def values(self):
+        # {address: register} over the populated ranges (diagnostics only)
+        return {address: value for block in self.blocks
+                for address, value in enumerate(block.values, block.address)}
+
+    def blockFor(self, address, count):
+        n = bisect_right(self.starts, address) - 1
+        if n < 0:
+            return None
+        block = self.blocks[n]
+        if address + count > block.address + len(block.view):
+            return None
+        return block
+
+    def getValues(self, address, count=1):
+        block = self.blockFor(address, count)
+        if block is None:
+            return ExcCodes.ILLEGAL_ADDRESS
+        return block.getValues(address, count)
+
+    def setValues(self, address, values):
+        regs = asRegisters(values)
+        block = self.blockFor(address, len(regs))
+        if block is None:
+            return ExcCodes.ILLEGAL_ADDRESS
+        return block.setValues(address, regs)
+
+    def publish(self, writes):
+        # Group by block; each block publishes its share as one snapshot.
+        groups = {}
+        for address, values in writes:
+            regs = asRegisters(values)
+            block = self.blockFor(address, len(regs))
+            if block is None:
+                return ExcCodes.ILLEGAL_ADDRESS
+            groups.setdefault(id(block), (block, []))[1].append((address, regs))
+        for block, blockWrites in groups.values():
+            block.publish(blockWrites)
+        return None
+
+    def reset(self):
+        for block in self.blocks:
+            block.reset()
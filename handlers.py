@@ -0,0 +1,186 @@
+# ==============================================
+#  HANDLERS.PY - MODBUSINATOR server / request handler hooks
+# ==============================================
+#
+# Thin subclasses of the pymodbus servers whose only change is the per-connection
+# request handler, so MODBUSINATOR can observe each connection: bytes in/out,
+# function codes, request latency and exception responses (see metrics.py).
+# Request handling itself is left to pymodbus, except that FC3/FC4 reads are
+# answered from the encoded response cache when one is attached (see cache.py),
+# TCP connections can be limited and rate limited (see admission.py), and
+# successful FC6/FC16/FC23 writes are reported to onWrite subscribers (writeback.py).
+
+import time
+from functools import partial
+from cache import registersPayload
+from writeback import writeCodes
+from pymodbus.constants import ExcCodes
+from pymodbus.pdu import ExceptionResponse
+from pymodbus.server import ModbusTcpServer, ModbusSerialServer
+from pymodbus.server.requesthandler import ServerRequestHandler
+
+class ModbusinatorRequestHandler(ServerRequestHandler):
+    def __init__(self, owner, tracePacket, tracePdu, traceConnect):
+        super().__init__(owner, tracePacket, tracePdu, traceConnect)
+        self.metrics = owner.metrics
+        self.responseCache = owner.responseCache
+        self.writeNotifier = owner.writeNotifier
+        self.responseError = False
+        self.cacheKey = None        # set while a cacheable miss is being answered
+        self.cacheGeneration = 0
+        self.admission = owner.admission
+        self.admitted = False
+        self.clientIP = None
+        self.bucket = None          # the client IP's token bucket when the admission rate limit is on
+        self.lastActivity = 0.0
+        self.idleTimer = None
+
+    def peerName(self):
+        peer = self.transport.get_extra_info("peername") if self.transport else None
+        if isinstance(peer, tuple):
+            return f"{peer[0]}:{peer[1]}"
+        return str(self.server.comm_params.source_address[0])  # serial: the port name
+
+    def callback_connected(self):
+        super().callback_connected()
+        if self.admission is not None and not self.admit():
+            return
+        if self.metrics is not None:
+            self.metrics.connected(id(self), self.peerName(), self.comm_params.comm_type.name)
+
+    def callback_disconnected(self, exc):
+        super().callback_disconnected(exc)
+        if self.admitted:
+            self.admitted = False
+            self.admission.release(self.clientIP)
+            if self.idleTimer is not None:
+                self.idleTimer.cancel()
+                self.idleTimer = None
+        if self.metrics is not None:
+            self.metrics.disconnected(id(self))
+
+    def admit(self):
+        # Over a connection limit: close right away. Closing through the transport
+        # lets asyncio report the loss, so callback_disconnected runs as usual.
+        peer = self.transport.get_extra_info("peername")
+        self.clientIP = peer[0] if isinstance(peer, tuple) else str(peer)
+        if not self.admission.admit(self.clientIP):
+            self.transport.close()
+            return False
+        self.admitted = True
+        if self.admission.rateLimit:
+            self.bucket = self.admission.bucketFor(self.clientIP)
+        if self.admission.idleTimeout:
+            self.lastActivity = time.monotonic()
+            self.idleTimer = self.loop.call_later(self.admission.idleTimeout, self.checkIdle)
+        return True
+
+    def checkIdle(self):
+        # One timer per connection, re-armed for the remaining time while traffic flows
+        self.idleTimer = None
+        if not self.admitted or self.transport is None:
+            return
+        remaining = self.lastActivity + self.admission.idleTimeout - time.monotonic()
+        if remaining > 0:
+            self.idleTimer = self.loop.call_later(remaining, self.checkIdle)
+            return
+        self.admission.reaped += 1
+        self.transport.close()
+
+    def callback_data(self, data, addr=None):
+        if self.admitted:
+            self.lastActivity = time.monotonic()
+        used = super().callback_data(data, addr)
+        if self.metrics is not None and used:
+            self.metrics.received(id(self), used)
+        return used
+
+    def send(self, data, addr=None):
+        if self.metrics is not None:
+            self.metrics.sent(id(self), len(data))
+        super().send(data, addr)
+
+    def server_send(self, pdu, addr):
+        if pdu:
+            self.responseError = pdu.isError()
+            if self.cacheKey is not None and not self.responseError:
+                payload = registersPayload(pdu.function_code, pdu.registers)
+                self.responseCache.put(self.cacheKey, payload, self.cacheGeneration)
+                self.sendPayload(payload, pdu.dev_id, pdu.transaction_id, addr)
+                return
+        super().server_send(pdu, addr)
+
+    def sendPayload(self, payload, devId, tid, addr=None):
+        # Frame an already encoded response PDU (MBAP header or RTU/ASCII wrapper)
+        self.send(self.framer.encode(payload, devId, tid), addr)
+
+    def busyResponse(self, pdu):
+        response = ExceptionResponse(pdu.function_code, ExcCodes.DEVICE_BUSY)
+        response.transaction_id = pdu.transaction_id
+        response.dev_id = pdu.dev_id
+        return response
+
+    async def handle_request(self):
+        pdu = self.last_pdu
+        cache = self.responseCache
+        # Over the per-client rate: answer busy at once instead of queueing work
+        busy = self.bucket is not None and pdu is not None and not self.admission.allow(self.bucket, self.clientIP)
+        if pdu is None or (self.metrics is None and cache is None and self.writeNotifier is None and not busy):
+            await super().handle_request()
+            return
+        started = time.perf_counter()
+        self.responseError = False
+        key = cache.keyFor(pdu) if cache is not None and not busy else None
+        payload = cache.get(key) if key is not None else None
+        if busy:
+            self.server_send(self.busyResponse(pdu), self.last_addr)
+        elif payload is not None:
+            self.sendPayload(payload, pdu.dev_id, pdu.transaction_id, self.last_addr)
+        else:
+            self.cacheKey = key
+            self.cacheGeneration = cache.generation if key is not None else 0
+            try:
+                await super().handle_request()
+            finally:
+                self.cacheKey = None
+            if self.writeNotifier is not None and pdu.function_code in writeCodes and not self.responseError:
+                self.notifyWrite(pdu)
+        if self.metrics is not None:
+            self.metrics.request(id(self), pdu.function_code, time.perf_counter() - started, self.responseError)
+
+    def notifyWrite(self, pdu):
+        if pdu.function_code == 23:
+            self.writeNotifier.written(pdu.dev_id, pdu.write_address, pdu.write_registers)
+        else:
+            self.writeNotifier.written(pdu.dev_id, pdu.address, pdu.registers)
+
+class ModbusinatorServerMixin:
+    metrics = None
+    responseCache = None
+    admission = None
+    writeNotifier = None
+
+    def callback_new_connection(self):
+        return ModbusinatorRequestHandler(self, self.trace_packet, self.trace_pdu, self.trace_connect)
+
+class ModbusinatorTcpServer(ModbusinatorServerMixin, ModbusTcpServer):
+    def __init__(self, context, *, metrics=None, responseCache=None, admission=None, writeNotifier=None,
+                 reusePort=False, **kwargs):
+        self.metrics = metrics
+        self.responseCache = responseCache
+        self.writeNotifier = writeNotifier
+        self.admission = admission  # admission.AdmissionControl, or None for no limits
+        self.reusePort = reusePort  # SO_REUSEPORT: several worker processes accept on one port
+        super().__init__(context, **kwargs)
+
+    def init_setup_connect_listen(self, host, port):
+        super().init_setup_connect_listen(host, port)
+        if self.reusePort:
+            self.call_create = partial(self.call_create, reuse_port=True)
+
+class ModbusinatorSerialServer(ModbusinatorServerMixin, ModbusSerialServer):
+    def __init__(self, context, *, metrics=None, responseCache=None, writeNotifier=None, **kwargs):
+        self.metrics = metrics
+        self.responseCache = responseCache
+        self.writeNotifier = writeNotifier
+        super().__init__(context, **kwargs)
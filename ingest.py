@@ -0,0 +1,246 @@
+# ==============================================
+#  INGEST.PY - streaming update sources for MODBUSINATOR
+# ==============================================
+#
+# Instead of calling update() synchronously, a producer can stream the same JSON
+# payloads (one per line / datagram) into MODBUSINATOR:
+#
+#   mb.startIngest("stdin")                        # JSONL on standard input
+#   mb.startIngest(["unix:/run/modbusinator.sock", "udp:127.0.0.1:5021"], maxRate=10)
+#
+# Source threads parse each message and merge it into one pending update:
+#   - a positional snapshot replaces the pending one (its blanks fall back to the
+#     older pending values) and supersedes older sparse values it covers
+#   - sparse changes merge per parameter, newest value wins
+# A worker applies the pending update at most maxRate times per second, so a burst
+# of hundreds of snapshots costs one write per interval and never backs up. Messages
+# folded into an already-pending update are counted as coalesced (mb.metrics()).
+# Sparse keys that are not a parameter index (negative, >= numParams, not an
+# integer) are dropped and counted as rejectedKeys.
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+from array import array
+from threading import Event, Lock, Thread
+from codec import asFloat, sparseChanges
+
+nan = float('nan')
+
+class Ingestor:
+    def __init__(self, mb, maxRate=20.0):
+        self.mb = mb
+        self.maxRate = maxRate          # applies per second; 0 = as fast as messages arrive
+        self.lock = Lock()
+        self.values = None              # pending snapshot, array('d') with NaN = keep current
+        self.changes = {}               # pending sparse {index: float}, newer than self.values
+        self.pending = Event()
+        self.stopping = False
+        self.worker = None
+        self.sources = []               # (name, closeable) per running source
+        self.messages = 0
+        self.coalesced = 0
+        self.applied = 0
+        self.parseErrors = 0
+        self.rejected = 0               # sparse keys that are not a parameter index (< 0, >= numParams)
+
+    # ---------------- merging (source threads) ----------------
+    def submit(self, text):
+        text = text.strip()
+        if not text:
+            return
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            self.parseErrors += 1
+            return
+        changes = sparseChanges(payload)
+        if changes is None:
+            values, blanks = self.mb.positionalValues(payload)
+            values = array('d', values)
+            for i in blanks:
+                values[i] = nan
+        else:
+            # Same rules as updateSparse: the merge indexes snapshots with these keys,
+            # so a negative one would land on a parameter counted from the end
+            sparse = {}
+            numParams = self.mb.numParams
+            for key, raw in changes.items():
+                try:
+                    i = int(key)
+                except (TypeError, ValueError):
+                    self.rejected += 1
+                    continue
+                if not 0 <= i < numParams:
+                    self.rejected += 1
+                    continue
+                val = asFloat(raw)
+                if val is not None:
+                    sparse[i] = val
+        with self.lock:
+            self.messages += 1
+            if self.values is not None or self.changes:
+                self.coalesced += 1
+            if changes is None:
+                self.mergeSnapshot(values, blanks)
+            else:
+                self.changes.update(sparse)
+            self.pending.set()
+
+    def mergeSnapshot(self, values, blanks):
+        older = self.values
+        if older is not None:
+            if self.changes:
+                # Pending sparse values are newer than the older snapshot: fold them in
+                count = len(older)
+                for i, v in self.changes.items():
+                    if i < count:
+                        older[i] = v
+                self.changes = {i: v for i, v in self.changes.items() if i >= count}
+            for i in blanks:
+                if i < len(older):
+                    values[i] = older[i]
+            if len(older) > len(values):
+                values.extend(older[len(values):])
+        if self.changes:
+            # Older sparse values survive only where this snapshot leaves a blank
+            count = len(values)
+            self.changes = {i: v for i, v in self.changes.items() if i >= count or values[i] != values[i]}
+        self.values = values
+
+    # ---------------- applying (worker thread) ----------------
+    def take(self):
+        with self.lock:
+            values, changes = self.values, self.changes
+            self.values, self.changes = None, {}
+            self.pending.clear()
+        return values, changes
+
+    def apply(self, values, changes):
+        if values is not None:
+            self.mb.updateValues(values)
+        if changes:
+            self.mb.updateSparse(changes)
+
+    async def applyAsync(self, values, changes):
+        # Unified mode: run on the serving loop, between requests
+        self.apply(values, changes)
+
+    def run(self):
+        interval = 1 / self.maxRate if self.maxRate else 0
+        while True:
+            self.pending.wait()
+            values, changes = self.take()
+            if values is not None or changes:
+                started = time.monotonic()
+                try:
+                    loop = self.mb.loop
+                    if loop is not None and loop.is_running():
+                        asyncio.run_coroutine_threadsafe(self.applyAsync(values, changes), loop).result(timeout=5)
+                    else:
+                        self.apply(values, changes)
+                    self.applied += 1
+                except Exception as e:
+                    self.mb.log('ERROR', f"MODBUSINATOR ingest apply error: {e}")
+                if interval and not self.stopping:
+                    time.sleep(max(0.0, interval - (time.monotonic() - started)))
+            with self.lock:
+                # take() may have consumed stop()'s wake-up: exit once nothing is pending
+                if self.stopping and self.values is None and not self.changes:
+                    return
+
+    # ---------------- sources ----------------
+    def start(self, source):
+        kind, _, target = source.partition(":")
+        kind = kind.lower()
+        if kind == "stdin":
+            thread = Thread(target=self.readLines, args=(sys.stdin,), daemon=True, name="modbusinator-ingest-stdin")
+            self.sources.append((source, None))
+        elif kind == "unix":
+            removeStale(target)
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(target)
+            server.listen()
+            thread = Thread(target=self.acceptUnix, args=(server,), daemon=True, name="modbusinator-ingest-unix")
+            self.sources.append((source, server))
+        elif kind == "udp":
+            host, _, port = target.rpartition(":")
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((host or "127.0.0.1", int(port)))
+            thread = Thread(target=self.readDatagrams, args=(sock,), daemon=True, name="modbusinator-ingest-udp")
+            self.sources.append((source, sock))
+        else:
+            raise ValueError(f"Unknown ingest source {source!r}; expected stdin, unix:<path> or udp:<host>:<port>")
+        if self.worker is None:
+            self.worker = Thread(target=self.run, daemon=True, name="modbusinator-ingest")
+            self.worker.start()
+        thread.start()
+
+    def readLines(self, stream):
+        for line in stream:
+            if self.stopping:
+                return
+            self.submit(line)
+
+    def acceptUnix(self, server):
+        while not self.stopping:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            Thread(target=self.readConnection, args=(conn,), daemon=True, name="modbusinator-ingest-conn").start()
+
+    def readConnection(self, conn):
+        with conn, conn.makefile("r", encoding="utf-8", errors="replace") as stream:
+            try:
+                self.readLines(stream)
+            except OSError:
+                pass
+
+    def readDatagrams(self, sock):
+        while not self.stopping:
+            try:
+                data, _ = sock.recvfrom(65535)
+            except OSError:
+                return
+            for line in data.decode("utf-8", errors="replace").splitlines():
+                self.submit(line)
+
+    def stop(self):
+        # Close the sources, apply whatever is still pending, stop the worker
+        self.stopping = True
+        for source, closeable in self.sources:
+            if closeable is not None:
+                try:
+                    closeable.shutdown(socket.SHUT_RDWR)  # wakes the thread blocked in accept/recv
+                except OSError:
+                    pass
+                closeable.close()
+                if source.lower().startswith("unix:"):
+                    removeStale(source.partition(":")[2])
+        self.sources = []
+        self.pending.set()
+        if self.worker is not None:
+            self.worker.join(timeout=5)
+            self.worker = None
+
+    def stats(self):
+        return {
+            "sources": [source for source, _ in self.sources],
+            "maxRate": self.maxRate,
+            "messages": self.messages,
+            "coalesced": self.coalesced,
+            "applied": self.applied,
+            "parseErrors": self.parseErrors,
+            "rejectedKeys": self.rejected,
+        }
+
+def removeStale(path):
+    # A stale socket file from a previous run would make bind() fail
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
@@ -1,9 +1,12 @@
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 loggingInitialized = False
 loggerName = 'MODBUSINATOR'
+queueListeners = {}  # logger name → QueueListener doing that logger's I/O
 
 def logDirectory(appName):
     """Service-safe log directory: ProgramData on Windows, XDG state on POSIX."""
@@ -13,7 +16,7 @@ def logDirectory(appName):
     stateHome = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
     return os.path.join(stateHome, appName, "logs")
 
-def initLogging(appName='MODBUSINATOR', debugMode=False):
+def initLogging(appName='MODBUSINATOR', debugMode=False, queued=False):
     """
     Set the active logger name and attach handlers if that logger has none.
     Safe to call from a host app (e.g. appName='SCADA Data Link') before or
@@ -22,6 +25,8 @@ def initLogging(appName='MODBUSINATOR', debugMode=False):
       or $XDG_STATE_HOME/<appName>/logs/app.log (POSIX)
     - File logging always DEBUG
     - Console logging DEBUG if debugMode=True, else WARNING
+    - queued=True puts the handlers behind a queue (see enableQueueLogging)
+    Returns True when it attached the handlers, False when the logger had some.
     """
     global loggingInitialized, loggerName
 
@@ -30,7 +35,8 @@ def initLogging(appName='MODBUSINATOR', debugMode=False):
     logger.setLevel(logging.DEBUG)
     logger.propagate = False
 
-    if not logger.handlers:
+    attached = not logger.handlers
+    if attached:
         logDir = logDirectory(appName)
         os.makedirs(logDir, exist_ok=True)
         logPath = os.path.join(logDir, "app.log")
@@ -53,6 +59,52 @@ def initLogging(appName='MODBUSINATOR', debugMode=False):
         fileHandler.setFormatter(fileFormatter)
         logger.addHandler(fileHandler)
     loggingInitialized = True
+    if queued:
+        enableQueueLogging(appName)
+    return attached
+
+def enableQueueLogging(appName=None):
+    """
+    Move a logger's handlers behind a QueueHandler: callers only enqueue the
+    record and a background QueueListener does the formatting, file writes and
+    rollovers, so logging never blocks the caller on I/O.
+    No-op if the logger is already queued or has no handlers yet.
+    """
+    name = appName or loggerName
+    logger = logging.getLogger(name)
+    if name in queueListeners or not logger.handlers:
+        return
+    handlers = list(logger.handlers)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logQueue = queue.SimpleQueue()
+    listener = QueueListener(logQueue, *handlers, respect_handler_level=True)
+    listener.start()
+    logger.addHandler(QueueHandler(logQueue))
+    queueListeners[name] = listener
+
+def stopQueueLogging(appName=None):
+    """
+    Drain the queue, stop the listener and put the original handlers back on
+    the logger (synchronous logging again). Registered at exit for every logger.
+    """
+    name = appName or loggerName
+    listener = queueListeners.pop(name, None)
+    if listener is None:
+        return
+    listener.stop()
+    logger = logging.getLogger(name)
+    for handler in list(logger.handlers):
+        if isinstance(handler, QueueHandler):
+            logger.removeHandler(handler)
+    for handler in listener.handlers:
+        logger.addHandler(handler)
+
+def stopAllQueueLogging():
+    for name in list(queueListeners):
+        stopQueueLogging(name)
+
+atexit.register(stopAllQueueLogging)
 
 def logMessage(level, message, appName=None):
     """
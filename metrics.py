@@ -0,0 +1,289 @@
+# ==============================================
+#  METRICS.PY - MODBUSINATOR runtime instrumentation
+# ==============================================
+#
+# Plain counters and fixed-bucket histograms, cheap enough to record on every
+# request: one dict lookup and a few integer adds, no locks. Counters written
+# from several server threads are best-effort (a rare lost increment under
+# contention), which is fine for monitoring.
+#
+#   mb.metrics()                       → dict snapshot
+#   mb.writeMetrics("/var/lib/node_exporter/modbusinator.prom")
+#   mb.startMetricsServer(9108)        → http://127.0.0.1:9108/metrics
+#
+# With MODBUSINATOR(metricsRegisters=True) the main counters are also mirrored
+# as UINT32 (ABCD) into the first spare registers after the parameter map; see
+# diagnosticFields for the order.
+
+import os
+import time
+from bisect import bisect_left
+from threading import Thread
+
+latencyBuckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+updateBuckets = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+functionNames = {1: "read_coils", 2: "read_discrete_inputs", 3: "read_holding_registers",
+                 4: "read_input_registers", 5: "write_coil", 6: "write_register",
+                 15: "write_coils", 16: "write_registers", 22: "mask_write_register",
+                 23: "read_write_registers"}
+
+# UINT32 values mirrored into the diagnostic registers, two registers each
+diagnosticFields = ("requests", "requestErrors", "activeConnections", "totalConnections",
+                    "bytesIn", "bytesOut", "updates", "updateWrites", "lastUpdateMicros",
+                    "p99LatencyMicros")
+diagnosticRegisters = 2 * len(diagnosticFields)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        # Upper bound of the bucket holding the fraction-th observation
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+class Connection:
+    __slots__ = ("peer", "transport", "connectedAt", "requests", "bytesIn", "bytesOut", "functions")
+
+    def __init__(self, peer, transport):
+        self.peer = peer
+        self.transport = transport
+        self.connectedAt = time.time()
+        self.requests = 0
+        self.bytesIn = 0
+        self.bytesOut = 0
+        self.functions = {}
+
+class Metrics:
+    def __init__(self):
+        self.startedAt = time.time()
+        self.connections = {}       # id(handler) → Connection, open connections only
+        self.totalConnections = 0
+        self.functions = {}         # function code → request count
+        self.functionErrors = {}    # function code → exception responses
+        self.requests = 0
+        self.requestErrors = 0
+        self.bytesIn = 0
+        self.bytesOut = 0
+        self.latency = Histogram(latencyBuckets)
+        self.updates = 0
+        self.updateWrites = 0
+        self.updateSkipped = 0
+        self.updateErrors = 0
+        self.lastUpdateDuration = 0.0
+        self.updateDuration = Histogram(updateBuckets)
+        self.responseCache = None   # cache.ResponseCache when enabled; reports its own counters
+        self.ingest = None          # ingest.Ingestor while streaming sources run
+        self.admission = None       # admission.AdmissionControl when TCP limits are set
+        self.writeback = None       # writeback.WriteNotifier (client write notifications)
+
+    # ---------------- recording (hot path) ----------------
+    def connected(self, key, peer, transport):
+        self.connections[key] = Connection(peer, transport)
+        self.totalConnections += 1
+
+    def disconnected(self, key):
+        self.connections.pop(key, None)
+
+    def received(self, key, count):
+        self.bytesIn += count
+        conn = self.connections.get(key)
+        if conn is not None:
+            conn.bytesIn += count
+
+    def sent(self, key, count):
+        self.bytesOut += count
+        conn = self.connections.get(key)
+        if conn is not None:
+            conn.bytesOut += count
+
+    def request(self, key, functionCode, seconds, isError):
+        self.requests += 1
+        self.functions[functionCode] = self.functions.get(functionCode, 0) + 1
+        if isError:
+            self.requestErrors += 1
+            self.functionErrors[functionCode] = self.functionErrors.get(functionCode, 0) + 1
+        self.latency.observe(seconds)
+        conn = self.connections.get(key)
+        if conn is not None:
+            conn.requests += 1
+            conn.functions[functionCode] = conn.functions.get(functionCode, 0) + 1
+
+    def update(self, seconds, writes, skipped=0):
+        self.updates += 1
+        self.updateWrites += writes
+        self.updateSkipped += skipped
+        self.lastUpdateDuration = seconds
+        self.updateDuration.observe(seconds)
+
+    def updateError(self):
+        self.updateErrors += 1
+
+    # ---------------- reading ----------------
+    def snapshot(self):
+        return {
+            "uptimeSeconds": round(time.time() - self.startedAt, 3),
+            "requests": self.requests,
+            "requestErrors": self.requestErrors,
+            "functions": dict(self.functions),
+            "functionErrors": dict(self.functionErrors),
+            "bytesIn": self.bytesIn,
+            "bytesOut": self.bytesOut,
+            "activeConnections": len(self.connections),
+            "totalConnections": self.totalConnections,
+            "connections": [
+                {"peer": c.peer, "transport": c.transport, "connectedAt": c.connectedAt,
+                 "requests": c.requests, "bytesIn": c.bytesIn, "bytesOut": c.bytesOut,
+                 "functions": dict(c.functions)}
+                for c in list(self.connections.values())
+            ],
+            "latency": self.latency.snapshot(),
+            "updates": self.updates,
+            "updateWrites": self.updateWrites,
+            "updateSkipped": self.updateSkipped,
+            "updateErrors": self.updateErrors,
+            "lastUpdateSeconds": self.lastUpdateDuration,
+            "updateDuration": self.updateDuration.snapshot(),
+            "responseCache": self.responseCache.stats() if self.responseCache is not None else None,
+            "ingest": self.ingest.stats() if self.ingest is not None else None,
+            "admission": self.admission.stats() if self.admission is not None else None,
+            "writeback": self.writeback.stats() if self.writeback is not None else None,
+        }
+
+    def diagnosticValues(self):
+        values = {
+            "requests": self.requests,
+            "requestErrors": self.requestErrors,
+            "activeConnections": len(self.connections),
+            "totalConnections": self.totalConnections,
+            "bytesIn": self.bytesIn,
+            "bytesOut": self.bytesOut,
+            "updates": self.updates,
+            "updateWrites": self.updateWrites,
+            "lastUpdateMicros": int(self.lastUpdateDuration * 1e6),
+            "p99LatencyMicros": int(self.latency.quantile(0.99) * 1e6),
+        }
+        return [values[name] & 0xFFFFFFFF for name in diagnosticFields]
+
+    def diagnosticRegisters(self):
+        regs = []
+        for value in self.diagnosticValues():
+            regs += (value >> 16, value & 0xFFFF)
+        return regs
+
+    def prometheus(self, prefix="modbusinator"):
+        lines = []
+
+        def metric(name, kind, helpText, samples):
+            lines.append(f"# HELP {prefix}_{name} {helpText}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{labels} {value}")
+
+        def histogram(name, helpText, hist):
+            lines.append(f"# HELP {prefix}_{name} {helpText}")
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            running = 0
+            for bound, n in zip([*map(str, hist.buckets), "+Inf"], hist.counts):
+                running += n
+                lines.append(f'{prefix}_{name}_bucket{{le="{bound}"}} {running}')
+            lines.append(f"{prefix}_{name}_sum {hist.sum}")
+            lines.append(f"{prefix}_{name}_count {hist.count}")
+
+        fcLabel = lambda fc: f'{{function_code="{fc}",function="{functionNames.get(fc, "other")}"}}'
+        metric("requests_total", "counter", "Modbus requests handled by function code",
+               [(fcLabel(fc), n) for fc, n in sorted(self.functions.items())] or [("", 0)])
+        metric("request_errors_total", "counter", "Exception responses by function code",
+               [(fcLabel(fc), n) for fc, n in sorted(self.functionErrors.items())] or [("", 0)])
+        histogram("request_duration_seconds", "Request handling latency", self.latency)
+        metric("connections_active", "gauge", "Open client connections", [("", len(self.connections))])
+        metric("connections_total", "counter", "Client connections accepted", [("", self.totalConnections)])
+        conns = list(self.connections.values())
+        metric("connection_requests", "gauge", "Requests on each open connection",
+               [(f'{{peer="{c.peer}",transport="{c.transport}"}}', c.requests) for c in conns])
+        metric("bytes_received_total", "counter", "Bytes received from clients", [("", self.bytesIn)])
+        metric("bytes_sent_total", "counter", "Bytes sent to clients", [("", self.bytesOut)])
+        metric("updates_total", "counter", "update() calls applied", [("", self.updates)])
+        metric("update_writes_total", "counter", "Parameters written by updates", [("", self.updateWrites)])
+        metric("update_skipped_total", "counter", "Blank or invalid values skipped by updates", [("", self.updateSkipped)])
+        metric("update_errors_total", "counter", "Updates rejected (parse errors)", [("", self.updateErrors)])
+        histogram("update_duration_seconds", "update() duration", self.updateDuration)
+        if self.responseCache is not None:
+            cache = self.responseCache.stats()
+            metric("response_cache_hits_total", "counter", "Reads answered from the response cache", [("", cache["hits"])])
+            metric("response_cache_misses_total", "counter", "Cacheable reads that had to be encoded", [("", cache["misses"])])
+            metric("response_cache_evictions_total", "counter", "Cached responses evicted (LRU)", [("", cache["evictions"])])
+            metric("response_cache_invalidations_total", "counter", "Cached responses dropped by updates", [("", cache["invalidations"])])
+            metric("response_cache_entries", "gauge", "Cached responses held", [("", cache["entries"])])
+        ingest = self.ingest
+        if ingest is not None:
+            metric("ingest_messages_total", "counter", "Messages received from ingest sources", [("", ingest.messages)])
+            metric("ingest_coalesced_total", "counter", "Messages folded into an already pending update", [("", ingest.coalesced)])
+            metric("ingest_applied_total", "counter", "Coalesced updates applied", [("", ingest.applied)])
+            metric("ingest_parse_errors_total", "counter", "Ingest messages that were not valid JSON", [("", ingest.parseErrors)])
+            metric("ingest_rejected_keys_total", "counter", "Sparse keys outside 0..numParams-1 or not an index", [("", ingest.rejected)])
+        admission = self.admission
+        if admission is not None:
+            metric("admission_rejected_connections_total", "counter", "Connections closed on accept (connection limits)", [("", admission.rejected)])
+            metric("admission_reaped_connections_total", "counter", "Connections closed for being idle", [("", admission.reaped)])
+            metric("admission_throttled_requests_total", "counter", "Requests answered DEVICE_BUSY (rate limit)", [("", admission.throttled)])
+            metric("admission_throttled_clients", "gauge", "Distinct client IPs that have been rate limited", [("", len(admission.throttledClients))])
+        writeback = self.writeback
+        if writeback is not None and writeback.subscriptions:
+            metric("writeback_writes_total", "counter", "Client writes reported to onWrite subscribers", [("", writeback.writes)])
+            metric("writeback_coalesced_total", "counter", "Client writes merged into an already pending batch", [("", writeback.coalesced)])
+            metric("writeback_batches_total", "counter", "Change batches delivered", [("", writeback.batches)])
+            metric("writeback_callback_errors_total", "counter", "onWrite callbacks that raised", [("", writeback.callbackErrors)])
+        return "\n".join(lines) + "\n"
+
+    def writePrometheus(self, path):
+        # Write-then-rename so a scraper (e.g. node_exporter textfile) never sees half a file
+        tmpPath = f"{path}.tmp"
+        with open(tmpPath, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmpPath, path)
+
+def startMetricsServer(metrics, port, host="127.0.0.1"):
+    # Serve GET /metrics as Prometheus text from a daemon thread; returns the server.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # scrapes are not worth a log line each
+
+    httpServer = ThreadingHTTPServer((host, port), MetricsHandler)
+    httpServer.daemon_threads = True
+    Thread(target=httpServer.serve_forever, daemon=True, name="modbusinator-metrics").start()
+    return httpServer
@@ -8,12 +8,25 @@
 #   python modbusDUMPER.py --connection SERIAL --comPort COM1
 #   python modbusDUMPER.py --dataType FLOAT32 --byteOrder CDAB
 #   python modbusDUMPER.py --dataType UINT16
+#   python modbusDUMPER.py --maxBlock 32          # smaller block reads for picky devices
+#   python modbusDUMPER.py --targets gateways.txt --concurrency 32 --timeout 1
+#   python modbusDUMPER.py --interval 1 --format csv --output trend.csv --deadband 0.05
+#   python modbusDUMPER.py --host 10.0.0.5 --port 502 --discover --map plc.json
+#   python modbusDUMPER.py --host 10.0.0.5 --port 502 --map plc.json --unitID 3   # scan the mapped regions
+#   python modbusDUMPER.py --interval 0.1 --freshness 60020 --statsEvery 10         # data age / latency percentiles
+#
+# Also importable: modbusDUMPER.main(["--port", "502", "--numParams", "8"]) runs one
+# invocation in-process. The pymodbus client modules load only once a connection is
+# opened (asyncio only for --targets / --discover), so --help, argument errors and
+# imports of the helpers stay fast.
 
 import argparse
-import struct
-from pymodbus.client import ModbusTcpClient, ModbusSerialClient
-from pymodbus import FramerType
-from pymodbus.exceptions import ModbusIOException
+import csv
+import json
+import math
+import sys
+import time
+from codec import decodeFreshness, decodeRegisters, freshnessRegisters, typeInfo
 
 # ====================== ARGUMENT PARSER ======================
 parser = argparse.ArgumentParser(description="MODBUSDUMPER - Modbus Scanner & Insight Tool")
@@ -33,107 +46,725 @@ parser.add_argument("--unitID", type=int, default=1, help="Unit / Slave ID")
 parser.add_argument("--startParam", type=int, default=1, help="First parameter to scan")
 parser.add_argument("--numParams", type=int, default=0, help="Number of parameters to scan (0 = scan ALL)")
 parser.add_argument("--host", default="127.0.0.1", help="IP address of the Modbus server (default 127.0.0.1 for localhost)")
-args = parser.parse_args()
-
-# ====================== DATA TYPE INFO =====================
-# regCount = how many 16-bit registers this type consumes
-# is32bit  = whether byteOrder applies
-typeInfo = {
-    "INT16":   {"regCount": 1, "is32bit": False},
-    "UINT16":  {"regCount": 1, "is32bit": False},
-    "INT32":   {"regCount": 2, "is32bit": True},
-    "UINT32":  {"regCount": 2, "is32bit": True},
-    "FLOAT32": {"regCount": 2, "is32bit": True},
-}
-regCount = typeInfo[args.dataType]["regCount"]
-is32bit = typeInfo[args.dataType]["is32bit"]
+parser.add_argument("--maxBlock", type=int, default=125, help="Max registers per read request (1-125, default 125)")
+parser.add_argument("--targets", default=None, help="File of TCP targets to poll concurrently (one host[:port]/unitID[/HR|IR][/first-last] per line)")
+parser.add_argument("--concurrency", type=int, default=16, help="Max targets polled at the same time with --targets (default 16)")
+parser.add_argument("--timeout", type=float, default=3.0, help="Timeout in seconds per target with --targets: its connect and all its reads; unfinished parameters report TIMEOUT (default 3)")
+parser.add_argument("--connsPerTarget", type=int, default=1, help="TCP connections per target with --targets; each keeps one transaction in flight (default 1)")
+parser.add_argument("--interval", type=float, default=0, help="Re-scan every N seconds on one connection (0 = single scan)")
+parser.add_argument("--count", type=int, default=0, help="Number of scans with --interval (0 = until Ctrl+C)")
+parser.add_argument("--format", choices=["TEXT", "CSV", "JSONL"], type=str.upper, default="TEXT", help="Row format with --interval (default TEXT)")
+parser.add_argument("--output", default=None, help="Write --interval rows to this file instead of stdout")
+parser.add_argument("--deadband", type=float, default=None, help="With --interval, only emit values that moved more than this since last emitted (0 = any change)")
+parser.add_argument("--flushEvery", type=int, default=1, help="Flush --interval output every N scans (default 1)")
+parser.add_argument("--statsEvery", type=float, default=60, help="Report scan rate/jitter to stderr every N seconds with --interval (default 60)")
+parser.add_argument("--discover", action="store_true", help="Find responding unit IDs and their valid HR/IR regions, write them to --map")
+parser.add_argument("--map", default=None, help="Register map file: written by --discover, otherwise scan only the mapped regions of --unitID/--register")
+parser.add_argument("--units", default="1-247", help="Unit IDs probed by --discover, e.g. 1-247 or 1,2,10-20 (default 1-247)")
+parser.add_argument("--probeTimeout", type=float, default=0.5, help="Response timeout in seconds for --discover reads (default 0.5)")
+parser.add_argument("--freshness", type=int, default=None, metavar="ADDR",
+                    help="Raw address of a MODBUSINATOR freshness header (freshnessHeader=True) in --register; "
+                         "reports data age, and with --interval update-to-visible latency percentiles")
+parser.add_argument("--discoverStride", type=int, default=32, help="--discover samples one register every N; regions shorter than this can be missed (default 32)")
+
+args = None  # parsed options, set by parseArgs(); everything below reads them
+
+def parseArgs(argv=None):
+    global args, numToScan, regCount, is32bit
+    args = parser.parse_args(argv)
+    if not 1 <= args.maxBlock <= 125:
+        parser.error("--maxBlock must be between 1 and 125")
+    if args.concurrency < 1 or args.connsPerTarget < 1:
+        parser.error("--concurrency and --connsPerTarget must be at least 1")
+    if args.targets and args.connection != "TCP":
+        parser.error("--targets polls TCP devices only")
+    if args.interval < 0 or args.count < 0 or args.flushEvery < 1:
+        parser.error("--interval/--count must be >= 0 and --flushEvery >= 1")
+    if args.discover and args.connection != "TCP":
+        parser.error("--discover probes TCP devices only")
+    if not 1 <= args.discoverStride <= args.maxBlock:
+        parser.error("--discoverStride must be between 1 and --maxBlock")
+    if args.freshness is not None and not 0 <= args.freshness <= 65536 - freshnessRegisters:
+        parser.error(f"--freshness must be a register address between 0 and {65536 - freshnessRegisters}")
+
+    # If user passes 0, scan ALL (up to 256)
+    numToScan = args.numParams if args.numParams > 0 else 256
+
+    # regCount = how many 16-bit registers this type consumes
+    # is32bit  = whether byteOrder applies
+    regCount = typeInfo[args.dataType]["regCount"]
+    is32bit = typeInfo[args.dataType]["is32bit"]
 
 # ====================== DECODE HELPERS =====================
-def orderBytes(reg1, reg2, order):
-    # reg1 = first register read, reg2 = second register read
-    # Each register is 2 bytes big-endian: reg -> (hi, lo)
-    a, b = reg1.to_bytes(2, 'big')   # bytes A, B
-    c, d = reg2.to_bytes(2, 'big')   # bytes C, D
-    layout = {
-        "ABCD": bytes([a, b, c, d]),
-        "CDAB": bytes([c, d, a, b]),
-        "BADC": bytes([b, a, d, c]),
-        "DCBA": bytes([d, c, b, a]),
-    }
-    return layout[order]
+def decodeBlock(registers):
+    # Whole block in one pass (see codec.decodeRegisters)
+    return decodeRegisters(registers, args.dataType, args.byteOrder)
 
 def decodeValue(registers):
-    if not is32bit:
-        raw = registers[0]
-        if args.dataType == "INT16":
-            return struct.unpack('>h', raw.to_bytes(2, 'big'))[0]
-        else:  # UINT16
-            return raw
-    orderedBytes = orderBytes(registers[0], registers[1], args.byteOrder)
-    if args.dataType == "INT32":
-        return struct.unpack('>i', orderedBytes)[0]
-    elif args.dataType == "UINT32":
-        return struct.unpack('>I', orderedBytes)[0]
-    else:  # FLOAT32
-        return struct.unpack('>f', orderedBytes)[0]
-
-# ====================== SETUP =====================
-if args.framer is None:
-    args.framer = "RTU" if args.connection.upper() == "SERIAL" else "SOCKET"
-framer = getattr(FramerType, args.framer)
-
-if args.connection.upper() == "TCP":
-    client = ModbusTcpClient(args.host, port=args.port, framer=framer)
-    connDesc = f"TCP {args.host}:{args.port} framer={args.framer} (Unit ID {args.unitID})"
-else:
-    client = ModbusSerialClient(
-        port=args.comPort,
-        baudrate=args.baud,
-        parity=args.parity,
-        stopbits=args.stopbits,
-        bytesize=args.bytesize,
-        framer=framer
-    )
-
-    connDesc = f"SERIAL {args.comPort} @ {args.baud} {args.bytesize}{args.parity}{args.stopbits} framer={args.framer} (Unit ID {args.unitID})"
-if not client.connect():
-    print("Failed to connect to Modbus device")
-    exit()
-regName = "Input Registers" if args.register.upper() == "IR" else "Holding Registers"
-modiconBase = 30001 if args.register.upper() == "IR" else 40001
-readFunc = client.read_input_registers if args.register.upper() == "IR" else client.read_holding_registers
-
-# If user passes 0, scan ALL (up to 256)
-numToScan = args.numParams if args.numParams > 0 else 256
-
-orderDesc = args.byteOrder if is32bit else "N/A (16-bit)"
-
-print(f"\n=== MODBUSDUMPER STARTED ===")
-print(f"Connection     : {connDesc}")
-print(f"Register Type  : {regName}")
-print(f"Data Type      : {args.dataType}")
-print(f"Byte Order     : {orderDesc}")
-print(f"Scanning       : Param {args.startParam} → {args.startParam + numToScan - 1}\n")
+    return decodeBlock(registers[:regCount])[0]
+
+# ====================== READ PLAN =====================
+def planReads(startParam, numParams, regCount, maxBlock):
+    # Fewest block reads covering the scan: [(firstParam, paramCount), ...].
+    # Blocks never split a parameter, so each holds maxBlock // regCount of them.
+    perBlock = max(1, maxBlock // regCount)
+    endParam = startParam + numParams
+    return [(p, min(perBlock, endParam - p)) for p in range(startParam, endParam, perBlock)]
+
+# ====================== OUTPUT =====================
+def formatLine(rawAddr, modiconAddr, v):
+    # v is a decoded value, or a status string such as "READ ERROR"
+    if isinstance(v, str):
+        return f"Raw:{rawAddr:8d} | Modicon:{modiconAddr:12d} | {v}"
+    if is32bit and args.dataType == "FLOAT32":
+        return f"Raw:{rawAddr:8d} | Modicon:{modiconAddr:12d} | v={v:8.2f}"
+    return f"Raw:{rawAddr:8d} | Modicon:{modiconAddr:12d} | v={v}"
+
+def registerInfo(register):
+    # (bank name, Modicon base) for "HR" / "IR"
+    if register == "IR":
+        return "Input Registers", 30001
+    return "Holding Registers", 40001
+
+# ====================== MULTI-TARGET (ASYNC) =====================
+# Target file: one device per line, "#" starts a comment.
+#   host[:port]/unitID[/HR|IR][/firstParam-lastParam]
+#   e.g.  10.0.0.5:502/3/IR/1-64
+# Missing pieces default to --port, --unitID, --register and --startParam/--numParams.
+def parseTarget(line):
+    parts = [part.strip() for part in line.split("/")]
+    host, _, port = parts[0].partition(":")
+    target = {
+        "host": host,
+        "port": int(port) if port else args.port,
+        "unitID": args.unitID,
+        "register": args.register,
+        "startParam": args.startParam,
+        "numParams": numToScan,
+    }
+    for part in parts[1:]:
+        part = part.upper()
+        if part in ("HR", "IR"):
+            target["register"] = part
+        elif "-" in part:
+            first, last = (int(n) for n in part.split("-", 1))
+            target["startParam"], target["numParams"] = first, last - first + 1
+        elif part:
+            target["unitID"] = int(part)
+    if not host or target["numParams"] < 1:
+        raise ValueError("missing host or empty parameter range")
+    return target
+
+def loadTargets(path):
+    targets = []
+    with open(path, encoding="utf-8") as f:
+        for lineNo, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                targets.append(parseTarget(line))
+            except ValueError as e:
+                parser.error(f"{path}:{lineNo}: bad target {line!r} ({e})")
+    return targets
+
+async def readParamsAsync(client, target, firstParam, paramCount, values):
+    # Fill values[p] with the decoded value or a status string for one planned block.
+    from pymodbus.exceptions import ModbusIOException
+    readFunc = client.read_input_registers if target["register"] == "IR" else client.read_holding_registers
+    rawStart = (firstParam - 1) * regCount
+    try:
+        result = await readFunc(rawStart, count=paramCount * regCount, device_id=target["unitID"])
+    except ModbusIOException:
+        # Silent device: probing each parameter would only multiply the timeouts
+        for p in range(firstParam, firstParam + paramCount):
+            values[p] = "NO RESPONSE"
+        return
+    except Exception as e:
+        for p in range(firstParam, firstParam + paramCount):
+            values[p] = f"ERROR: {e}"
+        return
+    if not result.isError():
+        for n, v in enumerate(decodeBlock(result.registers)):
+            values[firstParam + n] = v
+        return
+    if paramCount > 1:
+        for p in range(firstParam, firstParam + paramCount):
+            await readParamsAsync(client, target, p, 1, values)
+        return
+    values[firstParam] = "READ ERROR"
+
+async def scanTarget(target, clients, pending, values):
+    import asyncio
+    connected = await asyncio.gather(*(c.connect() for c in clients))
+    live = [c for c, ok in zip(clients, connected) if ok]
+    if not live:
+        return "noConnect"
+
+    async def worker(client):
+        while pending:
+            firstParam, paramCount = pending.pop()
+            await readParamsAsync(client, target, firstParam, paramCount, values)
+
+    await asyncio.gather(*(worker(c) for c in live))
+    return "ok"
+
+async def pollTarget(target, limiter):
+    # One target within --timeout overall, so a slow device cannot set the scan time
+    import asyncio
+    from pymodbus.client import AsyncModbusTcpClient
+    async with limiter:
+        started = time.perf_counter()
+        values = {}
+        clients = [
+            AsyncModbusTcpClient(target["host"], port=target["port"], framer=framer,
+                                 timeout=args.timeout, retries=0, reconnect_delay=0)
+            for _ in range(args.connsPerTarget)
+        ]
+        # Workers share one queue of planned blocks; each connection keeps one
+        # transaction in flight, so connsPerTarget sets the per-device parallelism.
+        pending = planReads(target["startParam"], target["numParams"], regCount, args.maxBlock)
+        pending.reverse()
+        scan = asyncio.ensure_future(scanTarget(target, clients, pending, values))
+        try:
+            done, _ = await asyncio.wait([scan], timeout=args.timeout)
+            if done:
+                status = scan.result()
+            else:
+                # pymodbus turns cancelling a request into an error reply, so stop the
+                # workers by emptying the queue and fail the reads in flight by closing
+                status = "timeout"
+                pending.clear()
+                values = {p: values.get(p, "TIMEOUT")
+                          for p in range(target["startParam"], target["startParam"] + target["numParams"])}
+        finally:
+            for c in clients:
+                c.close()
+        if not scan.done():
+            await asyncio.wait([scan])
+        return target, values, status, time.perf_counter() - started
+
+async def pollTargets(targets):
+    import asyncio
+    limiter = asyncio.Semaphore(args.concurrency)
+    return await asyncio.gather(*(pollTarget(t, limiter) for t in targets))
+
+def runTargets(path):
+    import asyncio
+    targets = loadTargets(path)
+    print(f"\n=== MODBUSDUMPER MULTI-TARGET STARTED ===")
+    print(f"Targets        : {len(targets)} from {path} (concurrency {args.concurrency}, "
+          f"{args.connsPerTarget} conn/target, timeout {args.timeout}s per target)")
+    print(f"Data Type      : {args.dataType}")
+    print(f"Byte Order     : {args.byteOrder if is32bit else 'N/A (16-bit)'}")
+    started = time.perf_counter()
+    results = asyncio.run(pollTargets(targets))
+    elapsed = time.perf_counter() - started
+    for target, values, status, took in results:
+        regName, modiconBase = registerInfo(target["register"])
+        print(f"\n--- {target['host']}:{target['port']} Unit ID {target['unitID']} ({regName}) "
+              f"Param {target['startParam']} → {target['startParam'] + target['numParams'] - 1} in {took:.3f}s ---")
+        if status == "noConnect":
+            print("Failed to connect to Modbus device")
+            continue
+        if status == "timeout":
+            print(f"Timed out after {args.timeout}s")
+        for p in sorted(values):
+            rawAddr = (p - 1) * regCount
+            print(formatLine(rawAddr, modiconBase + rawAddr, values[p]))
+    slowest = max((took for *_, took in results), default=0.0)
+    total = sum(took for *_, took in results)
+    timedOut = sum(status == "timeout" for _, _, status, _ in results)
+    print(f"\nPolled {len(results)} targets in {elapsed:.3f}s (slowest {slowest:.3f}s, sequential sum {total:.3f}s"
+          f"{f', {timedOut} timed out' if timedOut else ''})")
+
+# ====================== DISCOVERY (ASYNC) =====================
+# --discover maps a device without knowing anything about it:
+#   1. every unit ID in --units is probed concurrently with one register read and a
+#      short --probeTimeout; any reply except a gateway exception (10/11) means the
+#      unit exists (an ILLEGAL ADDRESS reply still proves someone answered)
+#   2. each responding unit's HR and IR banks are split into segments explored in
+#      parallel: one register is sampled every --discoverStride; a valid sample is
+#      bisected back to the region start and followed with maxBlock reads, the first
+#      failing block being bisected for the exact end
+#   3. the regions go to the --map file; a normal scan with --map reads exactly those
+#      ranges instead of probing holes parameter by parameter
+# Both bisections rely on a read of N registers succeeding only when all N are valid.
+gatewayExceptions = (10, 11)   # gateway path unavailable / target did not respond
+bankRegisters = 65536
+segmentRegisters = 4096        # address space explored per task
+
+def parseUnits(spec):
+    units = []
+    for part in spec.split(","):
+        first, _, last = part.strip().partition("-")
+        units.extend(range(int(first), int(last or first) + 1))
+    if not units or min(units) < 0 or max(units) > 255:
+        raise ValueError(f"bad unit list {spec!r}")
+    return list(dict.fromkeys(units))
+
+class ReadPool:
+    # Connections shared by every discovery task; each keeps one transaction in flight
+    def __init__(self, clients):
+        import asyncio
+        self.idle = asyncio.Queue()
+        for c in clients:
+            self.idle.put_nowait(c)
+        self.reads = 0
+
+    async def read(self, unit, bank, address, count):
+        # The response (possibly an exception response), or None on timeout / I/O error
+        client = await self.idle.get()
+        try:
+            readFunc = client.read_input_registers if bank == "IR" else client.read_holding_registers
+            self.reads += 1
+            return await readFunc(address, count=count, device_id=unit)
+        except Exception:
+            return None
+        finally:
+            self.idle.put_nowait(client)
+
+    async def readable(self, unit, bank, address, count):
+        result = await self.read(unit, bank, address, count)
+        return result is not None and not result.isError()
+
+async def probeUnit(pool, unit):
+    result = await pool.read(unit, "HR", 0, 1)
+    if result is None:
+        return False
+    return not result.isError() or getattr(result, "exception_code", 0) not in gatewayExceptions
+
+async def regionStart(pool, unit, bank, low, valid):
+    # First valid address in [low, valid]; valid is known good, everything from the
+    # answer to valid reads as one block
+    while low < valid:
+        mid = (low + valid) // 2
+        if await pool.readable(unit, bank, mid, valid - mid + 1):
+            valid = mid
+        else:
+            low = mid + 1
+    return valid
+
+async def regionStop(pool, unit, bank, start, limit):
+    # First invalid address after the valid start (or limit)
+    position = start
+    while position < limit:
+        count = min(args.maxBlock, limit - position)
+        if await pool.readable(unit, bank, position, count):
+            position += count
+            continue
+        good, bad = 0, count   # read(position, good) succeeds, read(position, bad) fails
+        while bad - good > 1:
+            mid = (good + bad) // 2
+            if await pool.readable(unit, bank, position, mid):
+                good = mid
+            else:
+                bad = mid
+        return position + good
+    return limit
+
+async def exploreSegment(pool, unit, bank, low, high):
+    # A region found at the first sample may have started in the previous segment:
+    # bisect back over one stride (the overlap is merged afterwards)
+    regions = []
+    known = max(low - args.discoverStride, -1)   # last address known invalid
+    address = low
+    while address < high:
+        if not await pool.readable(unit, bank, address, 1):
+            known = address
+            address += args.discoverStride
+            continue
+        start = await regionStart(pool, unit, bank, known + 1, address)
+        stop = await regionStop(pool, unit, bank, address, high)
+        regions.append([start, stop])
+        known = stop
+        address = stop + 1     # the next region may start right after the gap
+    return regions
+
+def mergeRegions(regions):
+    # [start, stop) pairs from adjacent segments → [start, count] per contiguous region
+    merged = []
+    for start, stop in sorted(regions):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return [[start, stop - start] for start, stop in merged]
+
+async def exploreBank(pool, unit, bank):
+    import asyncio
+    segments = await asyncio.gather(*(
+        exploreSegment(pool, unit, bank, low, min(low + segmentRegisters, bankRegisters))
+        for low in range(0, bankRegisters, segmentRegisters)
+    ))
+    return mergeRegions([region for regions in segments for region in regions])
+
+async def discover(units):
+    import asyncio
+    from pymodbus.client import AsyncModbusTcpClient
+    clients = [
+        AsyncModbusTcpClient(args.host, port=args.port, framer=framer,
+                             timeout=args.probeTimeout, retries=0, reconnect_delay=0)
+        for _ in range(args.concurrency)
+    ]
+    try:
+        connected = await asyncio.gather(*(c.connect() for c in clients))
+        live = [c for c, ok in zip(clients, connected) if ok]
+        if not live:
+            return None, 0
+        pool = ReadPool(live)
+        present = await asyncio.gather(*(probeUnit(pool, unit) for unit in units))
+        found = [unit for unit, ok in zip(units, present) if ok]
+        banks = await asyncio.gather(*(exploreBank(pool, unit, bank) for unit in found for bank in ("HR", "IR")))
+        regions = iter(banks)
+        return [{"unitID": unit, "HR": next(regions), "IR": next(regions)} for unit in found], pool.reads
+    finally:
+        for c in clients:
+            c.close()
+
+def runDiscover():
+    import asyncio
+    try:
+        units = parseUnits(args.units)
+    except ValueError as e:
+        parser.error(f"--units: {e}")
+    mapPath = args.map or "modbusMap.json"
+    print(f"\n=== MODBUSDUMPER DISCOVERY STARTED ===")
+    print(f"Connection     : TCP {args.host}:{args.port} framer={args.framer}")
+    print(f"Probing        : {len(units)} unit IDs over {args.concurrency} connections "
+          f"(timeout {args.probeTimeout}s, stride {args.discoverStride}, maxBlock {args.maxBlock})")
+    started = time.perf_counter()
+    found, reads = asyncio.run(discover(units))
+    elapsed = time.perf_counter() - started
+    if found is None:
+        print("Failed to connect to Modbus device")
+        return
+    for unit in found:
+        for bank in ("HR", "IR"):
+            regName, modiconBase = registerInfo(bank)
+            for start, count in unit[bank]:
+                print(f"Unit {unit['unitID']:3d} | {regName:17s} | Raw {start:5d}-{start + count - 1:<5d} "
+                      f"| Modicon {modiconBase + start}-{modiconBase + start + count - 1} | {count} registers")
+    registerMap = {"host": args.host, "port": args.port,
+                   "discovered": time.strftime("%Y-%m-%dT%H:%M:%S"), "units": found}
+    with open(mapPath, "w", encoding="utf-8") as f:
+        json.dump(registerMap, f, indent=1)
+    print(f"\nFound {len(found)} unit(s) in {elapsed:.3f}s ({reads} reads); map written to {mapPath}")
+
+def planFromMap(path, unitID, register):
+    # Read plan covering every whole parameter inside the mapped regions
+    try:
+        with open(path, encoding="utf-8") as f:
+            units = json.load(f)["units"]
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f"--map {path}: {e}")
+    regions = next((unit.get(register, []) for unit in units if unit["unitID"] == unitID), None)
+    if regions is None:
+        parser.error(f"--map {path}: unit ID {unitID} was not discovered")
+    plan = []
+    for start, count in regions:
+        firstParam = -(-start // regCount) + 1
+        lastParam = (start + count) // regCount
+        if lastParam >= firstParam:
+            plan += planReads(firstParam, lastParam - firstParam + 1, regCount, args.maxBlock)
+    return plan
 
 # ====================== SCAN =====================
-for p in range(args.startParam, args.startParam + numToScan):
+def scanParam(p, values):
+    from pymodbus.exceptions import ModbusIOException
     rawAddr = (p - 1) * regCount
-    modiconAddr = modiconBase + rawAddr
 
     try:
         result = readFunc(rawAddr, count=regCount, device_id=args.unitID)
 
         if result.isError():
-            print(f"Raw:{rawAddr:8d} | Modicon:{modiconAddr:12d} | READ ERROR")
-            continue
-        v = decodeValue(result.registers)
-        if is32bit and args.dataType == "FLOAT32":
-            print(f"Raw:{rawAddr:8d} | Modicon:{modiconAddr:12d} | v={v:8.2f}")
-        else:
-            print(f"Raw:{rawAddr:8d} | Modicon:{modiconAddr:12d} | v={v}")
+            values[p] = "READ ERROR"
+            return
+        values[p] = decodeValue(result.registers)
+    except ModbusIOException:
+        values[p] = "NO RESPONSE"
+    except Exception as e:
+        values[p] = f"ERROR: {e}"
+
+def scanBlock(firstParam, paramCount, values):
+    # Fill values[p] with the decoded value or a status string for one planned block
+    # (same rules as readParamsAsync).
+    from pymodbus.exceptions import ModbusIOException
+    rawStart = (firstParam - 1) * regCount
+    try:
+        result = readFunc(rawStart, count=paramCount * regCount, device_id=args.unitID)
     except ModbusIOException:
-        print(f"Raw:{rawAddr:8d} | Modicon:{modiconAddr:12d} | NO RESPONSE")
+        # Silent device: probing each parameter would only multiply the timeouts
+        for p in range(firstParam, firstParam + paramCount):
+            values[p] = "NO RESPONSE"
+        return
     except Exception as e:
-        print(f"Raw:{rawAddr:8d} | Modicon:{modiconAddr:12d} | ERROR: {e}")
-print("\nScan complete.")
-client.close()
\ No newline at end of file
+        for p in range(firstParam, firstParam + paramCount):
+            values[p] = f"ERROR: {e}"
+        return
+    if not result.isError():
+        for n, v in enumerate(decodeBlock(result.registers)):
+            values[firstParam + n] = v
+        return
+    if paramCount > 1:
+        # The block hit a hole (or the device rejects large reads): go parameter by
+        # parameter so each gap is reported at its own address.
+        for p in range(firstParam, firstParam + paramCount):
+            scanParam(p, values)
+        return
+    values[firstParam] = "READ ERROR"
+
+# ====================== CONTINUOUS MODE =====================
+class ScanStats:
+    # Running scan-period statistics (Welford), constant memory however long the run.
+    def __init__(self, interval):
+        self.interval = interval
+        self.lastStart = None
+        self.reset()
+
+    def reset(self):
+        self.scans = 0
+        self.overruns = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.maxScan = 0.0
+        self.periods = 0
+        self.windowStart = time.monotonic()
+
+    def record(self, scanStart, scanTime):
+        self.scans += 1
+        self.maxScan = max(self.maxScan, scanTime)
+        if scanTime > self.interval:
+            self.overruns += 1
+        if self.lastStart is not None:
+            period = scanStart - self.lastStart
+            self.periods += 1
+            delta = period - self.mean
+            self.mean += delta / self.periods
+            self.m2 += delta * (period - self.mean)
+        self.lastStart = scanStart
+
+    def summary(self):
+        rate = 1 / self.mean if self.mean > 0 else 0.0
+        jitter = math.sqrt(self.m2 / (self.periods - 1)) if self.periods > 1 else 0.0
+        return (f"scans={self.scans} rate={rate:.2f}/s target={1 / self.interval:.2f}/s "
+                f"period={self.mean * 1000:.1f}ms jitter={jitter * 1000:.1f}ms "
+                f"maxScan={self.maxScan * 1000:.1f}ms overruns={self.overruns}")
+
+# Freshness header (MODBUSINATOR freshnessHeader=True): update sequence, epoch time
+# of the publish, update duration. Read right after each scan's values:
+#   age     = now - header time, every scan (how old the data just read is)
+#   latency = now - header time, on scans that saw a new sequence (update published
+#             → visible to this master; includes up to one --interval of polling)
+# Both compare the server's clock with ours, so across hosts they are only as good
+# as the clock sync (NTP / PTP).
+def readFreshness():
+    # → (sequence, timestamp, duration) or None
+    try:
+        result = readFunc(args.freshness, count=freshnessRegisters, device_id=args.unitID)
+        if result.isError():
+            return None
+        return decodeFreshness(result.registers)
+    except Exception:
+        return None
+
+def percentiles(samples):
+    if not samples:
+        return "n/a"
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return f"p50={pick(0.5):.1f} p90={pick(0.9):.1f} p99={pick(0.99):.1f} max={ordered[-1] * 1000:.1f}ms"
+
+class FreshnessStats:
+    def __init__(self):
+        self.lastSequence = None
+        self.reset()
+
+    def reset(self):
+        self.ages = []
+        self.latencies = []
+        self.durations = []
+        self.updates = 0
+        self.missed = 0         # sequences published and overwritten between two scans
+        self.stalled = 0        # scans that saw the same sequence as the previous one
+        self.errors = 0
+
+    def record(self, header, now):
+        if header is None:
+            self.errors += 1
+            return
+        sequence, timestamp, duration = header
+        self.ages.append(now - timestamp)
+        if self.lastSequence is not None:
+            step = (sequence - self.lastSequence) & 0xFFFFFFFF
+            if step == 0:
+                self.stalled += 1
+            else:
+                self.updates += 1
+                self.missed += step - 1
+                self.latencies.append(now - timestamp)
+                self.durations.append(duration)
+        self.lastSequence = sequence
+
+    def summary(self):
+        return (f"updates={self.updates} missed={self.missed} stalled={self.stalled} errors={self.errors} | "
+                f"age {percentiles(self.ages)} | latency {percentiles(self.latencies)} | "
+                f"update {percentiles(self.durations)}")
+
+def changedEnough(previous, v):
+    if previous is None or isinstance(v, str) or isinstance(previous, str):
+        return previous != v
+    return abs(v - previous) > args.deadband or (args.deadband == 0 and v != previous)
+
+def runInterval(plan):
+    out = open(args.output, "a", newline="", encoding="utf-8") if args.output else sys.stdout
+    writer = csv.writer(out) if args.format == "CSV" else None
+    if writer and (not args.output or out.tell() == 0):
+        writer.writerow(["ts", "param", "raw", "modicon", "value"])
+    lastEmitted = {}
+    stats = ScanStats(args.interval)
+    freshness = FreshnessStats() if args.freshness is not None else None
+    nextScan = time.monotonic()
+    scans = 0
+    try:
+        while not args.count or scans < args.count:
+            scanStart = time.monotonic()
+            values = {}
+            for firstParam, paramCount in plan:
+                scanBlock(firstParam, paramCount, values)
+            if freshness:
+                freshness.record(readFreshness(), time.time())
+            ts = time.time()
+            stats.record(scanStart, time.monotonic() - scanStart)
+            scans += 1
+
+            rows = []
+            for p, v in values.items():
+                if args.deadband is not None:
+                    if not changedEnough(lastEmitted.get(p), v):
+                        continue
+                    lastEmitted[p] = v
+                rows.append((p, v))
+            # One write per scan; flush only every flushEvery scans
+            if writer:
+                writer.writerows(
+                    (f"{ts:.3f}", p, (p - 1) * regCount, modiconBase + (p - 1) * regCount, v) for p, v in rows
+                )
+            elif args.format == "JSONL":
+                out.write("".join(
+                    json.dumps({"ts": round(ts, 3), "param": p, "raw": (p - 1) * regCount,
+                                "modicon": modiconBase + (p - 1) * regCount,
+                                ("error" if isinstance(v, str) else "v"): v if v == v else None}) + "\n"
+                    for p, v in rows
+                ))
+            else:
+                stamp = time.strftime("%H:%M:%S", time.localtime(ts))
+                out.write("".join(
+                    f"{stamp} {formatLine((p - 1) * regCount, modiconBase + (p - 1) * regCount, v)}\n" for p, v in rows
+                ))
+            if scans % args.flushEvery == 0:
+                out.flush()
+
+            if time.monotonic() - stats.windowStart >= args.statsEvery:
+                print(f"[stats] {stats.summary()}", file=sys.stderr)
+                if freshness:
+                    print(f"[stats] freshness {freshness.summary()}", file=sys.stderr)
+                    freshness.reset()
+                stats.reset()
+            nextScan += args.interval
+            delay = nextScan - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                nextScan = time.monotonic()  # link saturated: don't try to catch up in a burst
+    except KeyboardInterrupt:
+        pass
+    finally:
+        out.flush()
+        if args.output:
+            out.close()
+        print(f"[stats] {stats.summary()}", file=sys.stderr)
+        if freshness:
+            print(f"[stats] freshness {freshness.summary()}", file=sys.stderr)
+
+# ====================== MAIN =====================
+def main(argv=None):
+    global framer, readFunc, modiconBase
+    parseArgs(argv)
+    from pymodbus import FramerType  # pymodbus loads only past argument checking
+    if args.framer is None:
+        args.framer = "RTU" if args.connection.upper() == "SERIAL" else "SOCKET"
+    framer = getattr(FramerType, args.framer)
+
+    if args.targets:
+        runTargets(args.targets)
+        return
+
+    if args.discover:
+        runDiscover()
+        return
+
+    if args.connection.upper() == "TCP":
+        from pymodbus.client import ModbusTcpClient
+        client = ModbusTcpClient(args.host, port=args.port, framer=framer)
+        connDesc = f"TCP {args.host}:{args.port} framer={args.framer} (Unit ID {args.unitID})"
+    else:
+        from pymodbus.client import ModbusSerialClient
+        client = ModbusSerialClient(
+            port=args.comPort,
+            baudrate=args.baud,
+            parity=args.parity,
+            stopbits=args.stopbits,
+            bytesize=args.bytesize,
+            framer=framer
+        )
+
+        connDesc = f"SERIAL {args.comPort} @ {args.baud} {args.bytesize}{args.parity}{args.stopbits} framer={args.framer} (Unit ID {args.unitID})"
+    if not client.connect():
+        print("Failed to connect to Modbus device")
+        return
+    regName, modiconBase = registerInfo(args.register)
+    readFunc = client.read_input_registers if args.register.upper() == "IR" else client.read_holding_registers
+
+    orderDesc = args.byteOrder if is32bit else "N/A (16-bit)"
+    # Keep stdout clean for CSV/JSONL rows
+    banner = sys.stderr if args.interval > 0 and args.format != "TEXT" and not args.output else sys.stdout
+
+    print(f"\n=== MODBUSDUMPER STARTED ===", file=banner)
+    print(f"Connection     : {connDesc}", file=banner)
+    print(f"Register Type  : {regName}", file=banner)
+    print(f"Data Type      : {args.dataType}", file=banner)
+    print(f"Byte Order     : {orderDesc}", file=banner)
+    if args.map:
+        plan = planFromMap(args.map, args.unitID, args.register)
+        scanDesc = f"{sum(count for _, count in plan)} params in {len(plan)} block reads from {args.map}"
+    else:
+        plan = planReads(args.startParam, numToScan, regCount, args.maxBlock)
+        scanDesc = f"Param {args.startParam} → {args.startParam + numToScan - 1}"
+    print(f"Scanning       : {scanDesc}\n", file=banner)
+
+    if args.interval > 0:
+        runInterval(plan)
+        client.close()
+        return
+
+    for firstParam, paramCount in plan:
+        values = {}
+        scanBlock(firstParam, paramCount, values)
+        for p, v in values.items():
+            rawAddr = (p - 1) * regCount
+            print(formatLine(rawAddr, modiconBase + rawAddr, v))
+    if args.freshness is not None:
+        header = readFreshness()
+        if header is None:
+            print(f"\nFreshness      : no header at register {args.freshness}")
+        else:
+            sequence, timestamp, duration = header
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+            print(f"\nFreshness      : update #{sequence} at {stamp} "
+                  f"(age {(time.time() - timestamp) * 1000:.1f}ms, took {duration * 1000:.2f}ms)")
+    print("\nScan complete.")
+    client.close()
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,17 @@
 #       '[25.34, 26.1, 27.0]'                   ← 3 parameters
 #       '[{"v":25.34}, {"v":26.1}, {"v":27.0}]' ← also works
 #       '{"v":25.34}'                           ← single dict also works
+#   Sparse / delta updates address parameters by 0-based index and only touch
+#   those registers (values equal to what is already there are not rewritten):
+#       '{"12": 25.3, "907": 1.0}'
+#       '[{"i":12,"v":25.3}, {"i":907,"v":1.0}]'
+#
+# In-process hosts can skip JSON with .updateValues(values):
+#   a list/tuple of numbers, array('f'/'d'), a NumPy array, or any buffer of packed
+#   big-endian FLOAT32 bytes (bytes, bytearray, memoryview). NaN marks a blank.
+# and with .updateSparse({index: value}) for delta updates.
+# All update methods return the number of parameters actually written (0 when the
+# input cannot be parsed; never None).
 
 # ==============================================
 #  CONFIGURATION OPTIONS (passed to __init__)
@@ -31,20 +42,146 @@
 #                            # e.g. appName="SCADA Data Link"
 #                            # If omitted, uses the name from initLogging() when the
 #                            # host already called it, otherwise "MODBUSINATOR".
+# metricsRegisters=False     # True mirrors runtime counters (UINT32, ABCD) into the
+#                            # first 20 spare registers after the parameter map
+# logSummarySeconds=60       # update logging: one summary line per interval (rate,
+#                            # values written, skipped, parse errors); 0 = log every call
+# queuedLogging=True         # the handlers MODBUSINATOR attaches itself go behind a queue;
+#                            # a background thread does the file / console I/O
+#                            # (logic.enableQueueLogging). Handlers a host attached to the
+#                            # logger are left as they are.
+# responseCache=1024         # encoded FC3/FC4 responses kept for repeat polls (LRU
+#                            # entries, invalidated per written range); 0 = disabled
+# shards=None                # spread the map over several unit IDs / HR+IR banks, e.g.
+#                            # [{"unit":1,"bank":"HR","count":30000}, {"unit":2,"bank":"IR","count":9000}]
+#                            # numParams, unitID and registerType then come from the
+#                            # shards (see shards.py; splitShards() builds the list)
+# imagePath=None             # keep the registers in a memory-mapped file; a restart
+#                            # serves the last published values immediately (persist.py)
+# registerMap=None           # per-parameter type / byte order / scale / offset / address
+#                            # instead of ABCD FLOAT32 at registersPerParam, e.g.
+#                            # [{"type":"INT16","scale":0.1}, {"type":"FLOAT32","byteOrder":"CDAB"}]
+#                            # or a JSON file path; numParams comes from the map, one bank
+#                            # only (no shards). NaN is a blank for the integer types.
+#                            # See codec.RegisterMap.
+# freshnessHeader=False      # True publishes sequence / epoch time / duration of every
+#                            # update (4 x UINT32 ABCD) right after the 20 diagnostic
+#                            # registers, in the same snapshot as the first shard's data
+# maxConnections=None        # TCP admission control (admission.py); None = unlimited:
+# maxConnectionsPerIP=None   #   connections over either cap are closed on accept
+# idleTimeout=None           #   seconds without a request before a connection is closed
+# rateLimit=None             #   requests/second per client IP (all its connections);
+# rateBurst=None             #   excess requests get exception 6 (DEVICE_BUSY); burst
+#                            #   defaults to rateLimit, at least 1
+#
+# Runtime metrics (see metrics.py): mb.metrics(), mb.writeMetrics(path),
+# mb.startMetricsServer(9108) for Prometheus text on /metrics.
+#
+# Streaming sources (see ingest.py) parse and coalesce on a background worker:
+#   mb.startIngest(["stdin", "unix:/run/mb.sock", "udp:127.0.0.1:5021"], maxRate=20)
+#
+# Client writes to HR parameters (FC6/FC16/FC23) are delivered as coalesced
+# {paramIndex: float} batches on a dispatcher thread (see writeback.py):
+#   mb.onWrite(callback, range(0, 16))   # or a queue.Queue instead of a callback
+
+# ==============================================
+#  SERVING MODES
+# ==============================================
+#
+# Threaded (default): runServer() / startSerial() each run their own event loop
+#   on a daemon thread; update() can be called from any thread.
+# Unified: one event loop runs TCP, any number of serial ports and the updates.
+#   - asyncio hosts:   await mb.startAsync(["COM3", "COM4"])
+#                      await mb.updateAsync(inputString)
+#                      await mb.stopAsync()
+#   - threaded hosts:  mb.runUnified(["COM3"]); mb.submitUpdate(inputString); mb.stop()
+#   Updates run on the loop between requests, so they never race request handling.
+# Multi-process: mb.runWorkers(4) forks worker processes that all accept on the TCP
+#   port (SO_REUSEPORT) and serve reads from a shared-memory copy of the registers;
+#   this process keeps update() and any serial ports (see workers.py, POSIX only).
+#   Worker TCP traffic is not counted in the request metrics and bypasses the
+#   response cache.
+
+# ==============================================
+#  STARTUP / COMMAND LINE
+# ==============================================
+#
+# Importing this module only loads the register store (pymodbus.datastore); the
+# pymodbus server and transport modules (and pyserial), the worker processes and
+# the metrics HTTP server load when that feature is first started.
+# As a standalone service, updates come as JSON lines on stdin (or --ingest):
+#   producer | python modbusinator.py --numParams 512 --port 502
+#   python modbusinator.py --imagePath /var/lib/modbusinator/registers.img --ingest udp:127.0.0.1:5021
+# benchStartup.py measures import and startup times.
 
 import asyncio
+import sys
+from bisect import bisect_left
 import time
 import json
-import struct
+from array import array
 from contextlib import suppress
 from threading import Event, Thread
 from pymodbus import FramerType
-from pymodbus.server import ModbusTcpServer, ModbusSerialServer
-from pymodbus.datastore import ModbusSequentialDataBlock, ModbusDeviceContext, ModbusServerContext
+from pymodbus.datastore import ModbusServerContext
 import logic
-from logic import initLogging, logMessage
+from admission import AdmissionControl
+from cache import ResponseCache
+from codec import (RegisterMap, asFloat, decodeFreshness, encodeFreshness, floatMax,
+                   freshnessRegisters, sparseChanges)
+from writeback import WriteNotifier
+from shards import ShardMap
+from metrics import Metrics, diagnosticRegisters
+from logic import initLogging, enableQueueLogging, logMessage
 
 floatRegisters = 2  # IEEE-754 float is always two 16-bit registers (ABCD)
+spareRegisters = 100  # kept free after the first shard (diagnostics)
+diffChunk = 64  # registers compared per slice when narrowing a snapshot to what changed
+
+bufferOrders = {'@': sys.byteorder, '=': sys.byteorder, '<': 'little', '>': 'big', '!': 'big'}
+
+def floatsToRegisters(values):
+    # Big-endian FLOAT32 bytes (ABCD) read back as big-endian 16-bit words, giving
+    # [hi0, lo0, hi1, lo1, ...] for the whole snapshot in a couple of C-level passes.
+    floats = array('f', values)
+    regs = array('H')
+    if sys.byteorder == 'little':
+        floats.byteswap()
+        regs.frombytes(memoryview(floats).cast('B'))
+        regs.byteswap()
+    else:
+        regs.frombytes(memoryview(floats).cast('B'))
+    return regs
+
+def asFloatArray(values):
+    # Typed view of an in-process snapshot without building an intermediate list.
+    # Raw bytes (bytes, bytearray, memoryview of 'B') are packed big-endian FLOAT32;
+    # float buffers (array('f'/'d'), NumPy float arrays) keep their own byte order.
+    if isinstance(values, array) and values.typecode in ('f', 'd'):
+        return values
+    try:
+        view = memoryview(values)
+    except TypeError:
+        view = None
+    if view is not None:
+        fmt = view.format
+        order = bufferOrders.get(fmt[0], sys.byteorder)
+        code = fmt.lstrip('@=<>!')
+        if code in ('B', 'b', 'c'):
+            code, order = 'f', 'big'
+        if code in ('f', 'd'):
+            raw = view.cast('B') if view.c_contiguous else view.tobytes()
+            floats = array(code)
+            itemSize = floats.itemsize
+            floats.frombytes(raw[:len(raw) // itemSize * itemSize])
+            if order != sys.byteorder:
+                floats.byteswap()
+            return floats
+    try:
+        return array('d', values)
+    except TypeError:
+        # Sequences may carry None as a blank, same as update(); map it to the NaN marker
+        return array('d', (float('nan') if v is None else v for v in values))
 
 def asFramerType(framerType):
     if isinstance(framerType, FramerType):
@@ -61,36 +198,58 @@ class MODBUSINATOR:
     def __init__(self, numParams=256, registersPerParam=2, port=5020, host="0.0.0.0",
                  comPort=None, baudRate=9600, unitID=1,
                  bytesize=8, parity="E", stopbits=1, framerType=FramerType.RTU,
-                 registerType="HR", appName=None):
+                 registerType="HR", appName=None, metricsRegisters=False,
+                 logSummarySeconds=60, queuedLogging=True, responseCache=1024, shards=None,
+                 imagePath=None, maxConnections=None, maxConnectionsPerIP=None, idleTimeout=None,
+                 rateLimit=None, rateBurst=None, registerMap=None, freshnessHeader=False):
+        ownHandlers = False     # only queue handlers this constructor attached
         if appName:
-            initLogging(appName=appName)
+            ownHandlers = initLogging(appName=appName)
             self.appName = appName
         elif logic.loggingInitialized:
             self.appName = logic.loggerName
         else:
-            initLogging(appName='MODBUSINATOR')
+            ownHandlers = initLogging(appName='MODBUSINATOR')
             self.appName = 'MODBUSINATOR'
+        if queuedLogging and ownHandlers:
+            enableQueueLogging(self.appName)
         if registersPerParam < floatRegisters:
             self.log('WARN', f"registersPerParam={registersPerParam} is too small for FLOAT32; using {floatRegisters}")
             registersPerParam = floatRegisters
-        self.numParams = numParams
+        self.registerMap = None
+        if registerMap is not None:
+            if shards is not None:
+                raise ValueError("registerMap and shards cannot be combined")
+            if isinstance(registerMap, str):
+                with open(registerMap, encoding="utf-8") as f:
+                    registerMap = json.load(f)
+            self.registerMap = RegisterMap(registerMap)
+            shards = [{"unit": unitID, "bank": registerType, "count": self.registerMap.numParams,
+                       "registers": self.registerMap.registers}]
+        if shards is None:
+            shards = [{"unit": unitID, "bank": registerType, "count": numParams}]
+        self.shardMap = ShardMap(shards, registersPerParam, spare=spareRegisters, imagePath=imagePath)
+        image = self.shardMap.image
+        if image is not None and image.warm:
+            lastUpdate = time.ctime(image.lastUpdate) if image.lastUpdate else "never"
+            self.log('INFO', f"MODBUSINATOR restored register image {imagePath} (last update {lastUpdate})")
+        primary = self.shardMap.primary
+        self.numParams = self.shardMap.numParams
         self.registersPerParam = registersPerParam
-        self.totalRegisters = registersPerParam * numParams + 100
+        self.totalRegisters = primary.stopAddress + spareRegisters
         self.port = port
         self.host = host
         self.comPort = comPort
         self.baudRate = baudRate
-        self.unitID = unitID
+        self.unitID = primary.unit
         self.bytesize = bytesize
         self.parity = parity
         self.stopbits = stopbits
         self.framerType = asFramerType(framerType)
-        self.registerType = registerType.upper()
-        if self.registerType not in ("HR", "IR"):
-            raise ValueError(f"registerType must be 'HR' or 'IR', got {registerType!r}")
-        self.datablock = ModbusSequentialDataBlock(0, [0] * self.totalRegisters)
-        self.deviceContext = ModbusDeviceContext(**{self.registerType.lower(): self.datablock})
-        self.context = ModbusServerContext(devices={self.unitID: self.deviceContext}, single=False)
+        self.registerType = primary.bank
+        self.datablock = primary.block
+        self.deviceContext = primary.context
+        self.context = ModbusServerContext(devices=self.shardMap.contexts, single=False)
         self.tcpServer = None
         self.tcpThread = None
         self.tcpReady = Event()
@@ -98,33 +257,200 @@ class MODBUSINATOR:
         self.serialThread = None
         self.serialReady = Event()
         self.threads = []
+        self.loop = None          # unified mode: the one loop serving everything
+        self.loopThread = None    # unified mode started by runUnified()
+        self.loopStopped = None
+        self.serialServers = []   # unified mode: [(comPort, ModbusSerialServer), ...]
+        self.runtimeMetrics = Metrics()
+        self.responseCache = None
+        if responseCache:
+            self.responseCache = ResponseCache(responseCache)
+            for unit, funcCode, block in self.shardMap.snapshotBlocks:
+                self.responseCache.watch(block, funcCode, unit)
+            self.runtimeMetrics.responseCache = self.responseCache
+        self.admission = None
+        if any(limit is not None for limit in (maxConnections, maxConnectionsPerIP, idleTimeout, rateLimit)):
+            self.admission = AdmissionControl(maxConnections, maxConnectionsPerIP, idleTimeout, rateLimit, rateBurst)
+            self.runtimeMetrics.admission = self.admission
+        self.metricsServer = None
+        self.metricsRegisters = metricsRegisters
+        self.diagAddress = primary.stopAddress  # first spare register
+        self.freshnessAddress = None
+        self.freshnessStarted = None    # perf_counter() start of the update awaiting its header
+        self.freshnessSequence = 0
+        if freshnessHeader:
+            self.freshnessAddress = self.diagAddress + diagnosticRegisters
+            current = primary.context.getValues(primary.funcCode, self.freshnessAddress, freshnessRegisters)
+            self.freshnessSequence = decodeFreshness(current)[0]  # continues after a warm restart
+            self.log('INFO', f"MODBUSINATOR freshness header at register {self.freshnessAddress} "
+                             f"({self.registerBankName()}, Unit ID {self.unitID})")
+        self.diagThread = None
+        self.diagStop = Event()
+        self.ingestor = None
+        self.writeNotifier = WriteNotifier(self)
+        self.runtimeMetrics.writeback = self.writeNotifier
+        self.workerPool = None    # multi-process mode: TCP served by worker processes
+        self.logSummarySeconds = logSummarySeconds
+        self.summaryStarted = time.monotonic()
+        self.summaryBase = (0, 0, 0, 0)  # updates, writes, skipped, errors at summaryStarted
 
     def log(self, level, message):
         logMessage(level, message, appName=self.appName)
 
+    def summaryCounts(self):
+        m = self.runtimeMetrics
+        return (m.updates, m.updateWrites, m.updateSkipped, m.updateErrors)
+
+    def logUpdateSummary(self, force=False):
+        # One INFO line per logSummarySeconds instead of one per update() call.
+        now = time.monotonic()
+        elapsed = now - self.summaryStarted
+        if elapsed < self.logSummarySeconds and not force:
+            return
+        counts = self.summaryCounts()
+        updates, writes, skipped, errors = (c - b for c, b in zip(counts, self.summaryBase))
+        self.summaryStarted = now
+        self.summaryBase = counts
+        if updates or errors:
+            self.log('INFO', f"MODBUSINATOR {updates} updates in {elapsed:.1f}s ({updates / elapsed if elapsed else 0:.1f}/s), "
+                             f"{writes} values written, {skipped} skipped, {errors} parse errors")
+
+    def logUpdate(self, message):
+        if self.logSummarySeconds:
+            self.logUpdateSummary()
+        else:
+            self.log('INFO', f"{message} at {time.ctime()}")
+
+    def logUpdateError(self, message):
+        # With summaries on, only the first error of each interval is logged in full;
+        # the rest are counted in the next summary line.
+        if not self.logSummarySeconds or self.runtimeMetrics.updateErrors - self.summaryBase[3] == 1:
+            self.log('ERROR', message)
+        if self.logSummarySeconds:
+            self.logUpdateSummary()
+
     def registerBankName(self):
         return "Input Registers" if self.registerType == "IR" else "Holding Registers"
 
-    def writeFloat(self, address: int, value: float):
-        # IEEE-754 big-endian float → two registers (ABCD). Stride is registersPerParam.
-        floatBytes = struct.pack('>f', float(value))
-        regs = [
-            int.from_bytes(floatBytes[0:2], 'big'),
-            int.from_bytes(floatBytes[2:4], 'big'),
-        ]
-        funcCode = 4 if self.registerType == "IR" else 3
-        self.deviceContext.setValues(funcCode, address, regs)
+    def writeSnapshot(self, values, blanks=()):
+        # Encode a positional snapshot (param 0..len-1) once and commit each shard's slice
+        # of it with a single publish. Positions listed in blanks (ascending), and any
+        # padding registers when registersPerParam > 2, keep their current contents.
+        count = len(values)
+        if count == len(blanks):
+            return 0
+        if self.registerMap is not None:
+            return self.writeMapped(values, blanks)
+        regs = floatsToRegisters(values)
+        shards = self.shardMap.shards
+        for shard in (*shards[1:], shards[0]):  # first shard last: it carries the freshness header
+            first = shard.firstParam
+            if first >= count:
+                continue
+            stop = min(shard.stopParam, count)
+            shardRegs = regs if first == 0 and stop == count else regs[2 * first:2 * stop]
+            shardBlanks = blanks[bisect_left(blanks, first):bisect_left(blanks, stop)]
+            if first:
+                shardBlanks = [i - first for i in shardBlanks]
+            self.writeShard(shard, shardRegs, shardBlanks)
+        return count - len(blanks)
+
+    def writeShard(self, shard, regs, blanks):
+        # regs = FLOAT32 register pairs for the shard's first len(regs) // 2 parameters
+        count = len(regs) // floatRegisters
+        if count == len(blanks):
+            return
+        stride = shard.stride
+        if blanks or stride != floatRegisters:
+            image = shard.context.getValues(shard.funcCode, shard.address, count * stride)
+            for i in blanks:
+                regs[2 * i] = image[i * stride]
+                regs[2 * i + 1] = image[i * stride + 1]
+            image[0::stride] = regs[0::2]
+            image[1::stride] = regs[1::2]
+        else:
+            image = regs
+        self.publishImage(shard, image)
+
+    def writeMapped(self, values, blanks):
+        # Register map: the whole shard image is encoded in one pass (codec.RegisterMap)
+        shard = self.shardMap.primary
+        current = shard.context.getValues(shard.funcCode, shard.address, self.registerMap.registers)
+        self.publishImage(shard, self.registerMap.encode(values, blanks, current), current)
+        return min(len(values), self.numParams) - len(blanks)
+
+    def publishImage(self, shard, image, current=None):
+        # Write image at the shard's first register
+        if self.responseCache is None:
+            self.publishUpdate([(shard.address, image)], shard)
+            return
+        # Publish only the chunks that differ so cached responses for untouched
+        # ranges survive the update
+        if current is None:
+            current = shard.context.getValues(shard.funcCode, shard.address, len(image))
+        writes = []
+        for start in range(0, len(image), diffChunk):
+            chunk = image[start:start + diffChunk]
+            if chunk != current[start:start + diffChunk]:
+                if writes and writes[-1][0] + len(writes[-1][1]) == shard.address + start:
+                    writes[-1][1].extend(chunk)
+                else:
+                    writes.append((shard.address + start, chunk))
+        self.publishUpdate(writes, shard)
+
+    def publishUpdate(self, writes, shard):
+        # Update-path publish. The first shard's also carries the freshness header, so
+        # a master sees the header and the data it describes change together.
+        if self.freshnessStarted is not None and shard is self.shardMap.primary:
+            writes = [*writes, (self.freshnessAddress, self.freshnessHeader())]
+        if writes:
+            self.writeRegisters(writes, shard)
+            if self.shardMap.image is not None:
+                self.shardMap.image.stamp()
+
+    def freshnessHeader(self):
+        self.freshnessSequence += 1
+        duration = time.perf_counter() - self.freshnessStarted
+        self.freshnessStarted = None
+        return encodeFreshness(self.freshnessSequence, time.time(), duration)
+
+    def stampFreshness(self, started):
+        # An update starts: its header rides along with the first shard's publish
+        if self.freshnessAddress is not None and self.freshnessStarted is None:
+            self.freshnessStarted = started
+
+    def finishFreshness(self):
+        # Nothing in the first shard changed: publish the header on its own
+        if self.freshnessStarted is not None:
+            self.publishUpdate([], self.shardMap.primary)
 
     def update(self, inputString: str):
+        started = time.perf_counter()
         try:
             paramList = json.loads(inputString)
-            if not isinstance(paramList, list):
-                paramList = [paramList]
         except Exception as e:
-            self.log('ERROR', f"MODBUSINATOR JSON parse error: {e}")
-            return
-        writes = 0
+            self.runtimeMetrics.updateError()
+            self.logUpdateError(f"MODBUSINATOR JSON parse error: {e}")
+            return 0
+        self.stampFreshness(started)
+        changes = sparseChanges(paramList)
+        if changes is not None:
+            return self.updateSparse(changes)
+        values, blanks = self.positionalValues(paramList)
+        writes = self.writeSnapshot(values, blanks)
+        self.finishFreshness()
+        self.runtimeMetrics.update(time.perf_counter() - started, writes, len(blanks))
+        self.logUpdate(f"MODBUSINATOR updated {writes} parameters")
+        return writes
+
+    def positionalValues(self, paramList):
+        # Decoded positional payload → (values, blanks); blank positions hold 0.0
+        if not isinstance(paramList, list):
+            paramList = [paramList]
         limit = min(len(paramList), self.numParams)
+        values = []
+        blanks = []
+        integral = self.registerMap.integral if self.registerMap is not None else ()
 
         for i in range(limit):
             param = paramList[i]
@@ -135,20 +461,130 @@ class MODBUSINATOR:
             else:
                 raw = param
 
-            # Treat "", whitespace-only strings, or None as blank → skip write
-            if raw is None or (isinstance(raw, str) and raw.strip() == ""):
+            val = asFloat(raw)
+            if val is None or val != val and i in integral:  # NaN only encodes as FLOAT32
+                values.append(0.0)
+                blanks.append(i)
                 continue
+            values.append(val)
+        return values, blanks
 
-            # Convert to float safely; if conversion fails, skip this position
+    def updateSparse(self, changes):
+        # changes = {paramIndex: value}, 0-based like the positional forms. Values are
+        # routed to their shard in one pass; only the addressed registers are read and
+        # written, and unchanged values are not rewritten.
+        started = time.perf_counter()
+        self.stampFreshness(started)
+        shardOf = self.shardMap.shardOf
+        byShard = {}
+        valid = 0
+        integral = self.registerMap.integral if self.registerMap is not None else ()
+        for key, raw in changes.items():
             try:
-                val = float(raw)
+                i = int(key)
             except (TypeError, ValueError):
                 continue
+            val = asFloat(raw)
+            if val is None or not 0 <= i < self.numParams or val != val and i in integral:
+                continue
+            group = byShard.get(shardOf[i])
+            if group is None:
+                group = byShard[shardOf[i]] = ([], [])
+            group[0].append(i)
+            group[1].append(val)
+            valid += 1
+        written = 0
+        for n in sorted(byShard, reverse=True):  # first shard last (freshness header)
+            indices, values = byShard[n]
+            written += self.writeSparse(self.shardMap.shards[n], indices, values)
+        self.finishFreshness()
+        self.runtimeMetrics.update(time.perf_counter() - started, written, len(changes) - valid)
+        self.logUpdate(f"MODBUSINATOR updated {written} of {len(changes)} sparse parameters")
+        return written
+
+    def writeSparse(self, shard, indices, values):
+        if self.registerMap is not None:
+            return self.writeSparseMapped(shard, indices, values)
+        regs = floatsToRegisters(values)
+        low = shard.addressOf(min(indices))
+        current = shard.context.getValues(shard.funcCode, low, shard.addressOf(max(indices)) + floatRegisters - low)
+        writes = []
+        for n, i in enumerate(indices):
+            address = shard.addressOf(i)
+            hi, lo = regs[2 * n], regs[2 * n + 1]
+            if current[address - low] != hi or current[address - low + 1] != lo:
+                writes.append((address, [hi, lo]))
+        self.publishUpdate(writes, shard)
+        return len(writes)
+
+    def writeSparseMapped(self, shard, indices, values):
+        encoded = self.registerMap.encodeEach(indices, values)
+        low = min(address for address, _ in encoded)
+        high = max(address + len(regs) for address, regs in encoded)
+        current = shard.context.getValues(shard.funcCode, shard.address + low, high - low)
+        writes = [(shard.address + address, regs) for address, regs in encoded
+                  if current[address - low:address - low + len(regs)] != regs]
+        self.publishUpdate(writes, shard)
+        return len(writes)
+
+    def writeRegisters(self, writes, shard=None):
+        # [(address, registers), ...] in one shard's bank (default: the first shard),
+        # published together as one snapshot.
+        # ModbusDeviceContext addresses its datablock one-based, hence the + 1.
+        block = (shard or self.shardMap.primary).block
+        block.publish([(address + 1, regs) for address, regs in writes])
+
+    def updateValues(self, values):
+        # In-process update path: accepts a sequence of numbers, array('f'/'d'), a NumPy
+        # array or any buffer (bytes/memoryview of packed big-endian FLOAT32). NaN (or None
+        # in a plain sequence) marks a position to skip, the same way blanks do in update();
+        # finite values beyond FLOAT32 range are skipped too, as update() does.
+        started = time.perf_counter()
+        try:
+            floats = asFloatArray(values)
+        except (TypeError, ValueError) as e:
+            self.runtimeMetrics.updateError()
+            self.logUpdateError(f"MODBUSINATOR updateValues error: {e}")
+            return 0
+        if len(floats) > self.numParams:
+            floats = floats[:self.numParams]
+        blanks = []
+        # In the FLOAT32 view a finite value beyond FLOAT32 range becomes inf, so one sum
+        # flags both NaN blanks and the values update() rejects (asFloat) as blanks
+        narrowed = floats if floats.typecode == 'f' else array('f', floats)
+        total = sum(narrowed)
+        if total != total or abs(total) == float('inf'):
+            blanks = [i for i, v in enumerate(floats) if v != v or floatMax < abs(v) < float('inf')]
+        self.stampFreshness(started)
+        writes = self.writeSnapshot(floats, blanks)
+        self.finishFreshness()
+        self.runtimeMetrics.update(time.perf_counter() - started, writes, len(blanks))
+        self.logUpdate(f"MODBUSINATOR updated {writes} parameters")
+        return writes
+
+    def runWorkers(self, workers=2):
+        if self.workerPool is not None or (self.tcpThread and self.tcpThread.is_alive()) or self.loopThread:
+            self.log('INFO', "MODBUSINATOR already running")
+            return
+        from workers import WorkerPool
+        pool = WorkerPool(self, workers)
+        try:
+            pool.start()
+        except (OSError, RuntimeError) as e:
+            self.log('ERROR', f"MODBUSINATOR TCP workers failed to start on {self.host}:{self.port}: {e}")
+            return
+        self.workerPool = pool
+        self.log(
+            'INFO',
+            f"MODBUSINATOR TCP listening on {self.host}:{self.port} "
+            f"({self.shardMap.describe()}) [{workers} worker processes]"
+        )
+        self.startDiagnostics()
 
-            addr = i * self.registersPerParam
-            self.writeFloat(addr, val)
-            writes += 1
-        self.log('INFO', f"MODBUSINATOR updated {writes} parameters at {time.ctime()}")
+    def stopWorkers(self):
+        if self.workerPool is not None:
+            self.workerPool.stop()
+            self.workerPool = None
 
     def shutdownServer(self, server, thread, name):
         if server is not None:
@@ -167,13 +603,18 @@ class MODBUSINATOR:
             self.log('INFO', "MODBUSINATOR already running")
             return
 
+        from handlers import ModbusinatorTcpServer
         self.tcpReady.clear()
 
         def runTcp():
             async def serve():
-                server = ModbusTcpServer(
+                server = ModbusinatorTcpServer(
                     self.context,
                     address=(self.host, self.port),
+                    metrics=self.runtimeMetrics,
+                    responseCache=self.responseCache,
+                    admission=self.admission,
+                    writeNotifier=self.writeNotifier,
                 )
                 self.tcpServer = server
                 if not await server.listen():
@@ -197,10 +638,32 @@ class MODBUSINATOR:
             self.tcpThread = None
             return
         self.threads = [self.tcpThread]
+        self.startDiagnostics()
         self.log(
             'INFO',
             f"MODBUSINATOR TCP listening on {self.host}:{self.port} "
-            f"({self.registerBankName()}, Unit ID {self.unitID})"
+            f"({self.shardMap.describe()})"
+        )
+
+    def newSerialServer(self, port):
+        from handlers import ModbusinatorSerialServer
+        return ModbusinatorSerialServer(
+            self.context,
+            metrics=self.runtimeMetrics,
+            responseCache=self.responseCache,
+            writeNotifier=self.writeNotifier,
+            framer=self.framerType,
+            port=port,
+            baudrate=self.baudRate,
+            bytesize=self.bytesize,
+            parity=self.parity,
+            stopbits=self.stopbits,
+        )
+
+    def serialDesc(self, port):
+        return (
+            f"{port} @ {self.baudRate} {self.bytesize}{self.parity}{self.stopbits} "
+            f"({self.shardMap.describe()})"
         )
 
     def startSerial(self, comPort=None):
@@ -218,15 +681,7 @@ class MODBUSINATOR:
 
         def runSerial():
             async def serve():
-                server = ModbusSerialServer(
-                    self.context,
-                    framer=self.framerType,
-                    port=port,
-                    baudrate=self.baudRate,
-                    bytesize=self.bytesize,
-                    parity=self.parity,
-                    stopbits=self.stopbits,
-                )
+                server = self.newSerialServer(port)
                 self.serialServer = server
                 if not await server.listen():
                     raise RuntimeError(f"Could not open serial port {port}")
@@ -250,12 +705,7 @@ class MODBUSINATOR:
             return
         if self.serialThread not in self.threads:
             self.threads.append(self.serialThread)
-        self.log(
-            'INFO',
-            f"MODBUSINATOR SERIAL listening on {self.comPort} @ {self.baudRate} "
-            f"{self.bytesize}{self.parity}{self.stopbits} "
-            f"({self.registerBankName()}, Unit ID {self.unitID})"
-        )
+        self.log('INFO', f"MODBUSINATOR SERIAL listening on {self.serialDesc(self.comPort)}")
 
     def stopSerial(self):
         server, thread, port = self.serialServer, self.serialThread, self.comPort
@@ -269,10 +719,269 @@ class MODBUSINATOR:
         self.log('INFO', f"MODBUSINATOR SERIAL stopped on {port}")
 
     def stop(self):
+        if self.loopThread is not None:
+            self.stopUnified()
+            return
         self.stopSerial()
         server, thread = self.tcpServer, self.tcpThread
         self.tcpServer = None
         self.tcpThread = None
         self.shutdownServer(server, thread, "TCP")
+        self.stopWorkers()
         self.threads = []
+        self.stopIngest()
+        self.writeNotifier.stop()
+        self.stopMetrics()
+        self.flushImage()
+        if self.logSummarySeconds:
+            self.logUpdateSummary(force=True)
         self.log('INFO', "MODBUSINATOR stopped cleanly")
+
+    # ---------------- unified single-loop mode ----------------
+    async def startAsync(self, comPorts=None):
+        # Start TCP plus every serial port on the running loop. comPorts defaults to
+        # [comPort] when one was configured.
+        if self.loop is not None:
+            self.log('INFO', "MODBUSINATOR already running")
+            return
+        if self.tcpThread is not None or self.serialThread is not None:
+            raise RuntimeError("MODBUSINATOR threaded servers are running; stop() them first")
+        from handlers import ModbusinatorTcpServer
+        server = ModbusinatorTcpServer(self.context, address=(self.host, self.port),
+                                       metrics=self.runtimeMetrics, responseCache=self.responseCache,
+                                       admission=self.admission, writeNotifier=self.writeNotifier)
+        if not await server.listen():
+            raise RuntimeError(f"Could not bind {self.host}:{self.port}")
+        self.loop = asyncio.get_running_loop()
+        self.loopStopped = asyncio.Event()
+        self.tcpServer = server
+        self.startDiagnostics()
+        self.log(
+            'INFO',
+            f"MODBUSINATOR TCP listening on {self.host}:{self.port} "
+            f"({self.shardMap.describe()}) [unified loop]"
+        )
+        if comPorts is None:
+            comPorts = [self.comPort] if self.comPort else []
+        for port in comPorts:
+            serial = self.newSerialServer(port)
+            try:
+                opened = await serial.listen()
+            except Exception as e:
+                self.log('ERROR', f"MODBUSINATOR SERIAL server error: {e}")
+                opened = False
+            if not opened:
+                self.log('ERROR', f"MODBUSINATOR SERIAL failed to start on {port}")
+                continue
+            self.serialServers.append((port, serial))
+            self.log('INFO', f"MODBUSINATOR SERIAL listening on {self.serialDesc(port)} [unified loop]")
+
+    async def updateAsync(self, inputString: str):
+        # Runs on the serving loop, i.e. between requests, never alongside one
+        return self.update(inputString)
+
+    async def stopAsync(self):
+        await asyncio.to_thread(self.stopIngest)  # the worker may be waiting on this loop
+        serialServers, self.serialServers = self.serialServers, []
+        for port, server in serialServers:
+            try:
+                await server.shutdown()
+            except Exception as e:
+                self.log('ERROR', f"MODBUSINATOR SERIAL shutdown error: {e}")
+            self.log('INFO', f"MODBUSINATOR SERIAL stopped on {port}")
+        server, self.tcpServer = self.tcpServer, None
+        if server is not None:
+            try:
+                await server.shutdown()
+            except Exception as e:
+                self.log('ERROR', f"MODBUSINATOR TCP shutdown error: {e}")
+        if self.loopStopped is not None:
+            self.loopStopped.set()
+        self.loop = None
+        await asyncio.to_thread(self.writeNotifier.stop)  # a callback may still be running
+        self.stopMetrics()
+        self.flushImage()
+        if self.logSummarySeconds:
+            self.logUpdateSummary(force=True)
+        self.log('INFO', "MODBUSINATOR stopped cleanly")
+
+    async def serveForever(self, comPorts=None):
+        await self.startAsync(comPorts)
+        await self.loopStopped.wait()
+
+    def runUnified(self, comPorts=None):
+        # Unified mode for threaded hosts: one daemon thread owns the only loop.
+        if self.loopThread and self.loopThread.is_alive():
+            self.log('INFO', "MODBUSINATOR already running")
+            return
+        ready = Event()
+
+        def runLoop():
+            async def serve():
+                await self.startAsync(comPorts)
+                ready.set()
+                await self.loopStopped.wait()
+
+            try:
+                asyncio.run(serve())
+            except Exception as e:
+                self.log('ERROR', f"MODBUSINATOR unified loop error: {e}")
+            finally:
+                ready.set()
+
+        self.loopThread = Thread(target=runLoop, daemon=True, name="modbusinator-loop")
+        self.loopThread.start()
+        if not ready.wait(timeout=5) or self.loop is None or not self.loopThread.is_alive():
+            self.log('ERROR', f"MODBUSINATOR unified loop failed to start on {self.host}:{self.port}")
+            self.loopThread = None
+            return
+        self.threads = [self.loopThread]
+
+    def submitUpdate(self, inputString: str):
+        # Thread-safe hand-off to the unified loop; returns a concurrent Future of the write count
+        if self.loop is None:
+            raise RuntimeError("MODBUSINATOR unified loop is not running")
+        return asyncio.run_coroutine_threadsafe(self.updateAsync(inputString), self.loop)
+
+    def stopUnified(self):
+        loop, thread = self.loop, self.loopThread
+        self.loopThread = None
+        if loop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self.stopAsync(), loop).result(timeout=5)
+            except Exception as e:
+                self.log('ERROR', f"MODBUSINATOR unified shutdown error: {e}")
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=5)
+        self.threads = []
+
+    # ---------------- runtime metrics ----------------
+    def metrics(self):
+        return self.runtimeMetrics.snapshot()
+
+    def writeMetrics(self, path):
+        self.runtimeMetrics.writePrometheus(path)
+
+    def startMetricsServer(self, port=9108, host="127.0.0.1"):
+        if self.metricsServer is not None:
+            return
+        from metrics import startMetricsServer
+        try:
+            self.metricsServer = startMetricsServer(self.runtimeMetrics, port, host)
+        except OSError as e:
+            self.log('ERROR', f"MODBUSINATOR metrics endpoint failed on {host}:{port}: {e}")
+            return
+        self.log('INFO', f"MODBUSINATOR metrics on http://{host}:{port}/metrics")
+
+    def startIngest(self, sources, maxRate=20.0):
+        # sources: "stdin", "unix:<path>", "udp:<host>:<port>" (or a list of them)
+        from ingest import Ingestor
+        if isinstance(sources, str):
+            sources = [sources]
+        if self.ingestor is None:
+            self.ingestor = Ingestor(self, maxRate)
+            self.runtimeMetrics.ingest = self.ingestor
+        for source in sources:
+            try:
+                self.ingestor.start(source)
+            except (OSError, ValueError) as e:
+                self.log('ERROR', f"MODBUSINATOR ingest source {source} failed: {e}")
+                continue
+            self.log('INFO', f"MODBUSINATOR ingesting from {source} (max {maxRate:g} updates/s)")
+
+    def onWrite(self, callback, paramRange=None):
+        # callback(changes) or queue.put_nowait(changes) with {paramIndex: float} for
+        # client writes in paramRange (range or (start, stop), 0-based; None = all)
+        if not any(shard.bank == "HR" for shard in self.shardMap.shards):
+            self.log('WARN', "MODBUSINATOR onWrite: no Holding Register parameters, clients cannot write")
+        self.writeNotifier.subscribe(callback, paramRange)
+        return callback
+
+    def offWrite(self, callback):
+        self.writeNotifier.unsubscribe(callback)
+
+    def flushImage(self):
+        # Force the memory-mapped register image to disk (imagePath only)
+        if self.shardMap.image is not None:
+            self.shardMap.image.flush()
+
+    def stopIngest(self):
+        if self.ingestor is not None:
+            self.ingestor.stop()
+            self.ingestor = None
+
+    def startDiagnostics(self, interval=1.0):
+        # Mirror the counters into the spare registers once a second
+        if not self.metricsRegisters or (self.diagThread and self.diagThread.is_alive()):
+            return
+        if self.diagAddress + diagnosticRegisters > self.totalRegisters:
+            self.log('WARN', "MODBUSINATOR no spare registers left for diagnostics")
+            return
+        self.diagStop.clear()
+
+        def mirror():
+            while not self.diagStop.wait(interval):
+                self.writeRegisters([(self.diagAddress, self.runtimeMetrics.diagnosticRegisters())])
+
+        self.diagThread = Thread(target=mirror, daemon=True, name="modbusinator-diag")
+        self.diagThread.start()
+
+    def stopMetrics(self):
+        self.diagStop.set()
+        if self.diagThread is not None and self.diagThread.is_alive():
+            self.diagThread.join(timeout=5)
+        self.diagThread = None
+        if self.metricsServer is not None:
+            self.metricsServer.shutdown()
+            self.metricsServer.server_close()
+            self.metricsServer = None
+
+def main(argv=None):
+    import argparse
+    import signal
+    parser = argparse.ArgumentParser(description="MODBUSINATOR - Modbus server fed with JSON updates")
+    parser.add_argument("--numParams", type=int, default=256, help="Parameters to serve (default 256)")
+    parser.add_argument("--host", default="0.0.0.0", help="TCP bind address (default 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=5020, help="TCP port (default 5020)")
+    parser.add_argument("--unitID", type=int, default=1, help="Unit / Slave ID")
+    parser.add_argument("--registerType", choices=["HR", "IR"], type=str.upper, default="HR", help="Register bank")
+    parser.add_argument("--comPort", default=None, help="Also serve this serial port")
+    parser.add_argument("--baud", type=int, default=9600, help="Baud rate with --comPort")
+    parser.add_argument("--parity", choices=["N", "E", "O"], type=str.upper, default="E", help="Parity with --comPort")
+    parser.add_argument("--imagePath", default=None, help="Memory-mapped register image for warm restarts")
+    parser.add_argument("--registerMap", default=None, help="JSON register map file (see codec.RegisterMap)")
+    parser.add_argument("--freshnessHeader", action="store_true", help="Publish the freshness header with every update")
+    parser.add_argument("--ingest", action="append", default=None,
+                        help="Update source: stdin, unix:<path> or udp:<host>:<port>; repeatable (default stdin)")
+    parser.add_argument("--maxRate", type=float, default=20.0, help="Max applied updates per second (default 20)")
+    parser.add_argument("--workers", type=int, default=0, help="Serve TCP from N worker processes (POSIX)")
+    parser.add_argument("--metricsPort", type=int, default=None, help="Serve Prometheus /metrics on this port")
+    args = parser.parse_args(argv)
+
+    mb = MODBUSINATOR(numParams=args.numParams, port=args.port, host=args.host, unitID=args.unitID,
+                      registerType=args.registerType, comPort=args.comPort, baudRate=args.baud,
+                      parity=args.parity, imagePath=args.imagePath, registerMap=args.registerMap,
+                      freshnessHeader=args.freshnessHeader)
+    if args.workers > 0:
+        mb.runWorkers(args.workers)
+    else:
+        mb.runServer()
+    if args.comPort:
+        mb.startSerial()
+    if args.metricsPort is not None:
+        mb.startMetricsServer(args.metricsPort)
+    mb.startIngest(args.ingest or ["stdin"], maxRate=args.maxRate)
+
+    # Ctrl+C or SIGTERM (service stop) shut down cleanly, flushing the register image
+    stopped = Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    try:
+        while not stopped.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mb.stop()
+
+if __name__ == "__main__":
+    main()
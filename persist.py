@@ -0,0 +1,117 @@
+# ==============================================
+#  PERSIST.PY - memory-mapped register image for warm restarts
+# ==============================================
+#
+# With MODBUSINATOR(imagePath="/var/lib/modbusinator/registers.img") the register
+# double buffers live in a memory-mapped file instead of process memory. Updates
+# write the file as a side effect of writing the registers (no serialization), and
+# a restarted server maps the file and serves the last published values at once:
+# startup only reads the header, whatever the map size.
+#
+# File layout (little-endian):
+#   header   magic, numParams, block count, registersPerParam, register type
+#            (function code of the first shard), last-update time (epoch seconds,
+#            host updates only: not the diagnostic registers or client writes)
+#   table    per populated range: unit, function code, address, count, front buffer
+#   data     per range: two register buffers (the snapshot double buffer)
+# The front-buffer byte flips only after a snapshot is complete in the other
+# buffer, so a crash mid-update leaves the previous snapshot published.
+#
+# If the file is missing or was written for a different layout it is recreated
+# (zeros, allocated sparsely by the filesystem). Writes reach the page cache on
+# every update and survive a process crash; flush() forces them to disk.
+
+import mmap
+import os
+import struct
+import time
+from datablock import MappedSnapshotDataBlock
+
+magic = b"MBNATOR1"
+headerFormat = "<8sIIHHd"       # magic, numParams, blocks, registersPerParam, register type, lastUpdate
+headerSize = 32
+lastUpdateOffset = 20
+blockFormat = "<HHIIB3x"        # unit, function code, address, count, front buffer
+blockSize = struct.calcsize(blockFormat)
+frontOffset = 12                # within a table entry
+
+def align8(n):
+    return (n + 7) & ~7
+
+class RegisterImageFile:
+    def __init__(self, path, layout, numParams, registersPerParam):
+        # layout = [(unit, funcCode, address, count), ...] one entry per populated range
+        self.path = path
+        self.layout = layout
+        self.numParams = numParams
+        self.registersPerParam = registersPerParam
+        self.registerType = layout[0][1]
+        self.offsets = []
+        position = align8(headerSize + blockSize * len(layout))
+        for _, _, _, count in layout:
+            self.offsets.append(position)
+            position += 2 * align8(2 * count)
+        self.size = position
+
+        self.warm = self.matches()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "r+b" if self.warm else "w+b") as f:
+            if not self.warm:
+                f.truncate(self.size)
+            self.mm = mmap.mmap(f.fileno(), self.size)
+        if not self.warm:
+            struct.pack_into(headerFormat, self.mm, 0, magic, numParams, len(layout),
+                             registersPerParam, self.registerType, 0.0)
+            for n, (unit, funcCode, address, count) in enumerate(layout):
+                struct.pack_into(blockFormat, self.mm, headerSize + n * blockSize, unit, funcCode, address, count, 0)
+
+        buffer = memoryview(self.mm)
+        self.blocks = []
+        for n, (_, _, address, count) in enumerate(layout):
+            front = self.mm[headerSize + n * blockSize + frontOffset] & 1
+            offset = self.offsets[n]
+            halves = (buffer[offset:offset + 2 * count].cast('H'),
+                      buffer[offset + align8(2 * count):offset + align8(2 * count) + 2 * count].cast('H'))
+            block = MappedSnapshotDataBlock(address, halves[front], halves[1 - front], front)
+            block.watchers.append(self.publisher(n, block))
+            self.blocks.append(block)
+
+    def matches(self):
+        # Existing file written for exactly this layout?
+        try:
+            if os.path.getsize(self.path) != self.size:
+                return False
+            with open(self.path, "rb") as f:
+                header = f.read(headerSize + blockSize * len(self.layout))
+        except OSError:
+            return False
+        fileMagic, numParams, blocks, registersPerParam, registerType, _ = struct.unpack_from(headerFormat, header)
+        if (fileMagic, numParams, blocks, registersPerParam, registerType) != \
+                (magic, self.numParams, len(self.layout), self.registersPerParam, self.registerType):
+            return False
+        for n, entry in enumerate(self.layout):
+            if struct.unpack_from(blockFormat, header, headerSize + n * blockSize)[:4] != entry:
+                return False
+        return True
+
+    def publisher(self, n, block):
+        entry = headerSize + n * blockSize + frontOffset
+
+        def published(spans):
+            # Watcher: the new front buffer is complete, point the header at it
+            self.mm[entry] = block.frontIndex
+        return published
+
+    def stamp(self):
+        # Called from the update path only: the diagnostic mirror and client writes
+        # publish too, but are not updates
+        struct.pack_into("<d", self.mm, lastUpdateOffset, time.time())
+
+    @property
+    def lastUpdate(self):
+        # Epoch seconds of the last publish (0.0 = never updated)
+        return struct.unpack_from("<d", self.mm, lastUpdateOffset)[0]
+
+    def flush(self):
+        self.mm.flush()
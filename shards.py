@@ -0,0 +1,174 @@
+# ==============================================
+#  SHARDS.PY - parameter map spread over unit IDs and register banks
+# ==============================================
+#
+# One register bank addresses at most 65,536 registers, so a large parameter set
+# is split into shards: each shard is a consecutive run of global parameter
+# indices placed at an address in one (unit ID, bank).
+#
+#   MODBUSINATOR(shards=[
+#       {"unit": 1, "bank": "HR", "count": 30000},
+#       {"unit": 1, "bank": "IR", "count": 30000},
+#       {"unit": 2, "bank": "HR", "count": 5000, "address": 1000},
+#   ])
+#
+# splitShards(numParams, registersPerParam, unitIDs, banks) fills whole banks in
+# order for the common "just make it fit" case. Shards take their parameter
+# indices in list order; "address" defaults to right after the previous shard in
+# the same bank (0 for the first). "registers" overrides the count * stride span
+# (a compiled register map places parameters itself, see codec.RegisterMap).
+#
+# ShardMap keeps a per-parameter lookup table (shardOf, one array('H') entry per
+# parameter) so routing an update is one index per value. Registers are allocated
+# only for the ranges the shards cover: each populated range is a SnapshotDataBlock,
+# a bank with several ranges is a SparseDataBlock, and banks nobody uses stay empty.
+# With imagePath the populated ranges live in one memory-mapped file instead.
+
+from array import array
+from pymodbus.datastore import ModbusDeviceContext
+from datablock import SnapshotDataBlock, SparseDataBlock
+from persist import RegisterImageFile
+
+bankCodes = {"HR": 3, "IR": 4}
+bankNames = {"HR": "Holding Registers", "IR": "Input Registers"}
+bankRegisters = 65536  # addresses 0..65535 per bank
+
+class Shard:
+    __slots__ = ("unit", "bank", "funcCode", "address", "firstParam", "count", "stride", "span", "block", "context")
+
+    def __init__(self, unit, bank, address, firstParam, count, stride, span=None):
+        self.unit = unit
+        self.bank = bank
+        self.funcCode = bankCodes[bank]
+        self.address = address          # register address of firstParam
+        self.firstParam = firstParam    # global index of the first parameter
+        self.count = count
+        self.stride = stride
+        self.span = span                # registers used, when not count * stride
+        self.block = None               # the bank's datablock (publish target)
+        self.context = None             # the unit's ModbusDeviceContext
+
+    @property
+    def stopParam(self):
+        return self.firstParam + self.count
+
+    @property
+    def stopAddress(self):
+        return self.address + (self.span if self.span is not None else self.count * self.stride)
+
+    def addressOf(self, index):
+        return self.address + (index - self.firstParam) * self.stride
+
+    def describe(self):
+        return f"unit {self.unit} {self.bank} {self.address}-{self.stopAddress - 1}"
+
+def asBank(bank):
+    name = str(bank).upper()
+    if name not in bankCodes:
+        raise ValueError(f"bank must be 'HR' or 'IR', got {bank!r}")
+    return name
+
+def splitShards(numParams, registersPerParam, unitIDs=(1,), banks=("HR", "IR"), spare=100):
+    # Shard specs filling each (unit, bank) in turn; the spare registers are kept
+    # free at the end of every bank.
+    perBank = (bankRegisters - spare) // registersPerParam
+    specs = []
+    remaining = numParams
+    for unit in unitIDs:
+        for bank in banks:
+            if remaining <= 0:
+                return specs
+            count = min(perBank, remaining)
+            specs.append({"unit": unit, "bank": bank, "count": count})
+            remaining -= count
+    if remaining > 0:
+        raise ValueError(f"{numParams} parameters do not fit in {len(unitIDs)} unit(s) x {len(banks)} bank(s) "
+                         f"at {registersPerParam} registers each")
+    return specs
+
+class ShardMap:
+    def __init__(self, specs, registersPerParam, spare=100, imagePath=None):
+        # spare registers are reserved right after the first shard (diagnostics etc.);
+        # imagePath keeps the registers in a memory-mapped file (see persist.py)
+        self.stride = registersPerParam
+        self.shards = []
+        nextAddress = {}
+        firstParam = 0
+        for spec in specs:
+            unit = int(spec.get("unit", 1))
+            bank = asBank(spec.get("bank", "HR"))
+            count = int(spec["count"])
+            if count <= 0:
+                raise ValueError(f"shard count must be positive, got {count}")
+            address = int(spec.get("address", nextAddress.get((unit, bank), 0)))
+            span = int(spec["registers"]) if "registers" in spec else None
+            shard = Shard(unit, bank, address, firstParam, count, registersPerParam, span)
+            nextAddress[(unit, bank)] = shard.stopAddress + (spare if not self.shards else 0)
+            self.shards.append(shard)
+            firstParam += count
+        if not self.shards:
+            raise ValueError("at least one shard is required")
+        self.numParams = firstParam
+        self.spare = spare
+
+        # Populated ranges per (unit, bank); adjacent ranges share one block
+        ranges = {}
+        for n, shard in enumerate(self.shards):
+            stop = shard.stopAddress + (spare if n == 0 else 0)
+            if shard.address < 0 or stop > bankRegisters:
+                raise ValueError(f"shard {shard.describe()} does not fit in {bankRegisters} registers")
+            ranges.setdefault((shard.unit, shard.bank), []).append([shard.address, stop])
+        populated = []   # [(unit, bank, start, stop)] after merging
+        for (unit, bank), spans in ranges.items():
+            spans.sort()
+            merged = [spans[0]]
+            for start, stop in spans[1:]:
+                if start < merged[-1][1]:
+                    raise ValueError(f"shards overlap in unit {unit} {bank} at address {start}")
+                if start == merged[-1][1]:
+                    merged[-1][1] = stop
+                else:
+                    merged.append([start, stop])
+            populated += [(unit, bank, start, stop) for start, stop in merged]
+
+        # ModbusDeviceContext addresses datablocks one-based, hence the + 1
+        layout = [(unit, bankCodes[bank], start + 1, stop - start) for unit, bank, start, stop in populated]
+        self.image = None
+        if imagePath:
+            self.image = RegisterImageFile(imagePath, layout, self.numParams, registersPerParam)
+            blocks = self.image.blocks
+        else:
+            blocks = [SnapshotDataBlock(address, count) for _, _, address, count in layout]
+        self.snapshotBlocks = [(unit, funcCode, block) for (unit, funcCode, _, _), block in zip(layout, blocks)]
+        grouped = {}
+        for (unit, bank, _, _), block in zip(populated, blocks):
+            grouped.setdefault((unit, bank), []).append(block)
+        banks = {key: group[0] if len(group) == 1 else SparseDataBlock(group) for key, group in grouped.items()}
+
+        self.contexts = {}
+        for unit in dict.fromkeys(shard.unit for shard in self.shards):
+            self.contexts[unit] = ModbusDeviceContext(
+                di=SparseDataBlock(), co=SparseDataBlock(),
+                hr=banks.get((unit, "HR"), SparseDataBlock()),
+                ir=banks.get((unit, "IR"), SparseDataBlock()),
+            )
+        self.shardOf = array('H')
+        for n, shard in enumerate(self.shards):
+            shard.block = banks[(shard.unit, shard.bank)]
+            shard.context = self.contexts[shard.unit]
+            self.shardOf.extend(array('H', [n]) * shard.count)
+
+    @property
+    def primary(self):
+        return self.shards[0]
+
+    def locate(self, index):
+        # Global parameter index → (unit, bank, register address)
+        shard = self.shards[self.shardOf[index]]
+        return shard.unit, shard.bank, shard.addressOf(index)
+
+    def describe(self):
+        if len(self.shards) == 1:
+            shard = self.primary
+            return f"{bankNames[shard.bank]}, Unit ID {shard.unit}"
+        return f"{self.numParams} params in {len(self.shards)} shards: " + ", ".join(s.describe() for s in self.shards)
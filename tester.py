@@ -1,8 +1,8 @@
 import json
 import time
-import struct
 from datetime import datetime
 from modbusinator import MODBUSINATOR
+from codec import decodeRegisters
 from pymodbus.client import ModbusTcpClient
 
 # ================== TESTER CONFIG ==================
@@ -72,14 +72,11 @@ def readAndPrintRegisters(client, numParams, registersPerParam, currentTs):
     # Choose correct Modicon base (30001 for IR, 40001 for HR)
     modiconBase = 30001 if registerType.upper() == "IR" else 40001
 
-    for i in range(numParams):
+    values = decodeRegisters(allRegisters, "FLOAT32", "ABCD", stride=registersPerParam)
+
+    for i, v in enumerate(values):
         rawAddr = i * registersPerParam
         modiconAddr = modiconBase + rawAddr
-        idx = rawAddr
-        reg1 = allRegisters[idx]
-        reg2 = allRegisters[idx + 1]
-        floatBytes = reg1.to_bytes(2, 'big') + reg2.to_bytes(2, 'big')
-        v = struct.unpack('>f', floatBytes)[0]
         print(f"Raw:{rawAddr:4d} | Modicon:{modiconAddr:5d} | v={round(v, 2):6.2f}")
     print("=" * 50)
 
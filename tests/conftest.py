@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modules live at the repository root; logs go to a throwaway state directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("XDG_STATE_HOME", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".state"))
@@ -0,0 +1,21 @@
+from admission import AdmissionControl
+
+def test_rate_below_one_per_second_still_admits_a_request():
+    admission = AdmissionControl(rateLimit=0.5)
+    assert admission.burst == 1.0
+    assert admission.admit("10.0.0.1")
+    bucket = admission.bucketFor("10.0.0.1")
+    assert [admission.allow(bucket, "10.0.0.1") for _ in range(3)] == [True, False, False]
+
+def test_connections_from_one_client_share_its_bucket():
+    admission = AdmissionControl(rateLimit=2)
+    buckets = []
+    for _ in range(3):
+        assert admission.admit("10.0.0.1")
+        buckets.append(admission.bucketFor("10.0.0.1"))
+    assert [admission.allow(bucket, "10.0.0.1") for bucket in buckets] == [True, True, False]
+    other = admission.bucketFor("10.0.0.2")
+    assert admission.allow(other, "10.0.0.2")
+    for _ in range(3):
+        admission.release("10.0.0.1")
+    assert "10.0.0.1" in admission.buckets        # not refilled yet: reconnecting does not reset it
@@ -0,0 +1,20 @@
+import math
+from array import array
+from codec import RegisterMap, floatMax
+
+def test_registerMap_saturates_float32_beyond_range():
+    registerMap = RegisterMap([{"type": "FLOAT32"}, {"type": "FLOAT32", "byteOrder": "CDAB"},
+                               "FLOAT32", {"type": "INT16", "scale": 0.1}, "FLOAT32"])
+    current = array('H', bytes(2 * registerMap.registers))
+    image = registerMap.encode([1e39, -1e39, float('inf'), 1e39, 2.5], [], current)
+    decoded = [registerMap.decode(i, image[registerMap.addresses[i]:registerMap.addresses[i] + registerMap.widths[i]])
+               for i in range(registerMap.numParams)]
+    assert decoded[:3] == [floatMax, -floatMax, floatMax]
+    assert math.isclose(decoded[3], 3276.7, rel_tol=1e-6)
+    assert decoded[4] == 2.5
+
+def test_registerMap_keeps_nan():
+    registerMap = RegisterMap(["FLOAT32", "FLOAT32"])
+    image = registerMap.encode([float('nan'), 1e39], [], array('H', bytes(8)))
+    assert math.isnan(registerMap.decode(0, image[0:2]))
+    assert registerMap.decode(1, image[2:4]) == floatMax
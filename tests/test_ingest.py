@@ -0,0 +1,45 @@
+import json
+import time
+from ingest import Ingestor
+from modbusinator import MODBUSINATOR
+
+def newIngestor(numParams=4):
+    mb = MODBUSINATOR(numParams=numParams, appName="MODBUSINATOR Test", logSummarySeconds=0)
+    return mb, Ingestor(mb)
+
+def test_sparse_keys_outside_the_map_are_rejected():
+    mb, ingestor = newIngestor()
+    ingestor.submit(json.dumps([1.0, 2.0, 3.0, 4.0]))
+    ingestor.submit(json.dumps({"-1": 42.0, "4": 43.0, "x": 44.0, "1": 5.0}))
+    ingestor.submit(json.dumps([None, None, None, None]))  # merge: blanks keep the older values
+    values, changes = ingestor.take()
+    assert list(values) == [1.0, 5.0, 3.0, 4.0]   # the last parameter is untouched
+    assert changes == {}
+    assert ingestor.rejected == 3
+    assert ingestor.stats()["rejectedKeys"] == 3
+
+def test_rejected_keys_without_a_pending_snapshot():
+    mb, ingestor = newIngestor()
+    ingestor.submit(json.dumps([{"i": -2, "v": 1.0}, {"i": 100, "v": 2.0}, {"i": 3, "v": 3.0}]))
+    values, changes = ingestor.take()
+    assert values is None
+    assert changes == {3: 3.0}
+    assert ingestor.rejected == 2
+
+def test_stop_applies_a_pending_update_and_returns():
+    mb = MODBUSINATOR(numParams=4, appName="MODBUSINATOR Test", logSummarySeconds=0)
+    ingestor = Ingestor(mb, maxRate=2)
+    ingestor.start("udp:127.0.0.1:0")
+    worker = ingestor.worker
+    ingestor.submit(json.dumps([1.0, 2.0, 3.0, 4.0]))
+    deadline = time.monotonic() + 5
+    while ingestor.applied < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    ingestor.submit(json.dumps([5.0, 6.0, 7.0, 8.0]))   # pending while the worker sleeps out maxRate
+    started = time.monotonic()
+    ingestor.stop()
+    assert time.monotonic() - started < 2
+    assert not worker.is_alive()
+    assert ingestor.applied == 2
+    shard = mb.shardMap.primary
+    assert list(shard.context.getValues(shard.funcCode, shard.address, 2)) == [0x40A0, 0x0000]   # 5.0
@@ -0,0 +1,29 @@
+import math
+from modbusinator import MODBUSINATOR
+
+def newServer(**kwargs):
+    return MODBUSINATOR(appName="MODBUSINATOR Test", logSummarySeconds=0, **kwargs)
+
+def readParams(mb):
+    shard = mb.shardMap.primary
+    registers = shard.context.getValues(shard.funcCode, shard.address, mb.registerMap.registers)
+    registerMap = mb.registerMap
+    return [registerMap.decode(i, registers[registerMap.addresses[i]:registerMap.addresses[i] + registerMap.widths[i]])
+            for i in range(registerMap.numParams)]
+
+def test_nan_is_a_blank_for_integer_parameters():
+    mb = newServer(registerMap=[{"type": "INT16", "scale": 0.1}, "UINT32", "FLOAT32"], freshnessHeader=True)
+    assert mb.update('[1.5, 7, 2.5]') == 3
+    assert mb.update('[NaN, NaN, NaN]') == 1           # only the FLOAT32 parameter takes NaN
+    values = readParams(mb)
+    assert math.isclose(values[0], 1.5) and values[1] == 7 and math.isnan(values[2])
+    assert mb.update('{"0": NaN, "1": 9}') == 1
+    assert mb.updateSparse({0: float('nan')}) == 0
+    assert readParams(mb)[:2] == [values[0], 9]
+    assert mb.freshnessStarted is None
+
+def test_update_methods_return_zero_on_bad_input():
+    mb = newServer(numParams=4)
+    assert mb.update('[1.0,') == 0
+    assert mb.updateValues(object()) == 0
+    assert mb.update('[1.0, 2.0]') == 2
@@ -0,0 +1,61 @@
+import queue
+import socket
+import time
+from threading import Event, Timer
+from pymodbus.client import ModbusTcpClient
+from modbusinator import MODBUSINATOR
+
+def freePort():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def writeFloat(port, address, registers):
+    client = ModbusTcpClient("127.0.0.1", port=port)
+    assert client.connect()
+    try:
+        assert not client.write_registers(address, registers, device_id=1).isError()
+    finally:
+        client.close()
+
+def test_onWrite_delivers_after_stop_and_restart():
+    port = freePort()
+    mb = MODBUSINATOR(numParams=4, port=port, host="127.0.0.1", appName="MODBUSINATOR Test", logSummarySeconds=0)
+    batches = queue.Queue()
+    mb.onWrite(batches)
+    mb.runServer()
+    try:
+        writeFloat(port, 0, [0x4120, 0x0000])           # param 0 = 10.0
+        assert batches.get(timeout=5) == {0: 10.0}
+        mb.stop()
+        mb.runServer()
+        writeFloat(port, 2, [0x41A0, 0x0000])           # param 1 = 20.0
+        assert batches.get(timeout=5) == {1: 20.0}
+    finally:
+        mb.stop()
+
+def test_stop_delivers_a_write_pending_behind_a_slow_callback():
+    mb = MODBUSINATOR(numParams=4, appName="MODBUSINATOR Test", logSummarySeconds=0)
+    entered, release, batches = Event(), Event(), []
+    def slow(batch):
+        batches.append(batch)
+        entered.set()
+        release.wait(5)
+    mb.onWrite(slow)
+    notifier = mb.writeNotifier
+    notifier.written(1, 0, [0, 0])
+    assert entered.wait(5)
+    notifier.written(1, 2, [0, 0])                      # pending while the callback runs
+    worker = notifier.worker
+    Timer(0.2, release.set).start()
+    started = time.monotonic()
+    notifier.stop()
+    assert time.monotonic() - started < 2
+    assert not worker.is_alive() and notifier.worker is None
+    assert batches == [{0: 0.0}, {1: 0.0}]
+    notifier.written(1, 4, [0, 0])                      # the next write starts one new dispatcher
+    deadline = time.monotonic() + 5
+    while len(batches) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert batches[2] == {2: 0.0}
+    notifier.stop()
@@ -0,0 +1,198 @@
+# ==============================================
+#  WORKERS.PY - multi-process Modbus TCP serving
+# ==============================================
+#
+# One asyncio loop in one interpreter is GIL-bound on a single core. With
+# mb.runWorkers(4) the parent process keeps owning update() and N worker processes
+# accept on the same TCP port (SO_REUSEPORT, the kernel spreads connections) and
+# answer reads from the register image in multiprocessing.shared_memory.
+#
+# Each populated register range (one SnapshotDataBlock in the parent) gets a
+# segment laid out as
+#     [sequence: uint64][registers: uint16 * count]
+# guarded by a seqlock: the parent bumps the sequence to odd, copies the spans a
+# publish wrote, and bumps it back to even; a worker copies the registers it needs
+# and retries if the sequence was odd or moved meanwhile. A FLOAT32 pair or a
+# 125-register block therefore always comes from one published snapshot, in any
+# process. (Plain stores in program order are enough on x86; the retry loop covers
+# a reader racing the writer.)
+#
+# Workers serve the image read-only: FC6/FC16 writes get ILLEGAL_FUNCTION, since
+# only the parent writes. Admission limits (admission.py) apply per worker:
+# maxConnections=10 with 4 workers admits up to 40.
+# Not available for requests served by workers:
+#   - request metrics: mb.metrics(), /metrics and the diagnostic registers count
+#     updates and the parent's own serial traffic only; connection and request
+#     counters and latencies stay at zero for worker TCP traffic
+#   - the response cache: nothing would invalidate it when the parent publishes
+#   - onWrite notifications (workers take no writes)
+#
+# POSIX only (SO_REUSEPORT). Workers are forked (get_context("fork")), possibly
+# after the host started threads of its own or MODBUSINATOR's (log QueueListener,
+# WriteNotifier dispatcher, ingest, diagnostics). Only the forking thread exists in
+# a worker, and any lock another thread held at that moment stays held there, so
+# workers touch none of those objects: they never log, write or notify, and only
+# run a fresh event loop over the shared segments. Python 3.12+ emits a
+# DeprecationWarning for fork() with threads running; that case is the one above.
+
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+from array import array
+from contextlib import suppress
+from multiprocessing import shared_memory
+from pymodbus.constants import ExcCodes
+from pymodbus.datastore import ModbusDeviceContext, ModbusServerContext
+from pymodbus.datastore.store import BaseModbusDataBlock
+from admission import AdmissionControl
+from datablock import SparseDataBlock
+from handlers import ModbusinatorTcpServer
+
+headerBytes = 8  # uint64 sequence number, keeps the registers 8-byte aligned
+
+class SharedImage:
+    # Parent side: one shared segment mirroring one SnapshotDataBlock
+    def __init__(self, block):
+        self.block = block
+        count = len(block.view)
+        self.shm = shared_memory.SharedMemory(create=True, size=headerBytes + 2 * count)
+        self.sequence = self.shm.buf[:headerBytes].cast('Q')
+        self.view = self.shm.buf[headerBytes:headerBytes + 2 * count].cast('H')
+        self.sequence[0] = 0
+        with block.writeLock:           # no publish may fall between the copy and the hook
+            self.view[:] = block.view
+            block.watchers.append(self.publish)
+
+    def publish(self, spans):
+        # Watcher: runs under the block's writer lock right after the swap
+        base = self.block.address
+        front = self.block.view
+        self.sequence[0] += 1           # odd: registers being written
+        for start, stop in spans:
+            self.view[start - base:stop - base] = front[start - base:stop - base]
+        self.sequence[0] += 1           # even: consistent again
+
+    def layout(self):
+        return (self.shm.name, self.block.address, len(self.block.view))
+
+    def close(self):
+        with suppress(ValueError):
+            self.block.watchers.remove(self.publish)
+        self.sequence.release()
+        self.view.release()
+        self.shm.close()
+        with suppress(FileNotFoundError):
+            self.shm.unlink()
+
+class SharedDataBlock(BaseModbusDataBlock):
+    # Worker side: seqlock reads from a SharedImage segment
+    def __init__(self, name, address, count):
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.sequence = self.shm.buf[:headerBytes].cast('Q')
+        self.raw = self.shm.buf[headerBytes:headerBytes + 2 * count]  # bytes, for copying out
+        self.view = self.raw.cast('H')
+        self.address = address
+        self.default_value = 0
+
+    @property
+    def values(self):
+        return self.getValues(self.address, len(self.view))
+
+    def getValues(self, address, count=1):
+        start = address - self.address
+        if start < 0 or len(self.view) < start + count:
+            return ExcCodes.ILLEGAL_ADDRESS
+        sequence, raw = self.sequence, self.raw
+        spins = 0
+        while True:
+            before = sequence[0]
+            if not before & 1:
+                regs = array('H')
+                regs.frombytes(raw[2 * start:2 * (start + count)])
+                if sequence[0] == before:
+                    return regs
+            spins += 1
+            if spins & 63 == 0:
+                time.sleep(0)  # writer is mid-publish; let it finish
+
+    def setValues(self, address, values):
+        return ExcCodes.ILLEGAL_FUNCTION  # the parent owns the image
+
+def serveWorker(host, port, layout, ready, stop, limits=None):
+    # layout = [(unit, bank, [(shmName, address, count), ...]), ...]
+    banks = {}
+    for unit, bank, segments in layout:
+        blocks = [SharedDataBlock(*segment) for segment in segments]
+        banks[(unit, bank)] = blocks[0] if len(blocks) == 1 else SparseDataBlock(blocks)
+    devices = {}
+    for unit in dict.fromkeys(unit for unit, _, _ in layout):
+        devices[unit] = ModbusDeviceContext(
+            di=SparseDataBlock(), co=SparseDataBlock(),
+            hr=banks.get((unit, "HR"), SparseDataBlock()),
+            ir=banks.get((unit, "IR"), SparseDataBlock()),
+        )
+    context = ModbusServerContext(devices=devices, single=False)
+
+    async def serve():
+        admission = AdmissionControl(**limits) if limits else None
+        server = ModbusinatorTcpServer(context, address=(host, port), admission=admission, reusePort=True)
+        if not await server.listen():
+            ready.put((os.getpid(), f"could not bind {host}:{port}"))
+            return
+        ready.put((os.getpid(), None))
+        while not stop.is_set():
+            await asyncio.sleep(0.2)
+        await server.shutdown()
+
+    asyncio.run(serve())
+
+class WorkerPool:
+    def __init__(self, mb, count):
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("multi-process serving needs SO_REUSEPORT (POSIX)")
+        self.mb = mb
+        self.count = count
+        self.images = []
+        self.processes = []
+        self.processContext = multiprocessing.get_context("fork")
+        self.ready = self.processContext.Queue()
+        self.stopEvent = self.processContext.Event()
+
+    def start(self, timeout=15):
+        bankOf = {3: "HR", 4: "IR"}
+        layout = {}
+        for unit, funcCode, block in self.mb.shardMap.snapshotBlocks:
+            image = SharedImage(block)
+            self.images.append(image)
+            layout.setdefault((unit, bankOf[funcCode]), []).append(image.layout())
+        layout = [(unit, bank, segs) for (unit, bank), segs in layout.items()]
+        limits = self.mb.admission.settings() if self.mb.admission is not None else None
+        for n in range(self.count):
+            process = self.processContext.Process(
+                target=serveWorker, args=(self.mb.host, self.mb.port, layout, self.ready, self.stopEvent, limits),
+                daemon=True, name=f"modbusinator-worker-{n}",
+            )
+            process.start()
+            self.processes.append(process)
+        deadline = time.monotonic() + timeout
+        for _ in self.processes:
+            try:
+                _, error = self.ready.get(timeout=max(0.1, deadline - time.monotonic()))
+            except Exception:
+                error = "worker did not start in time"
+            if error:
+                self.stop()
+                raise RuntimeError(error)
+
+    def stop(self):
+        self.stopEvent.set()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        for image in self.images:
+            image.close()
+        self.images = []
@@ -0,0 +1,190 @@
+# ==============================================
+#  WRITEBACK.PY - notifications for client writes to holding registers
+# ==============================================
+#
+# Masters can write HR parameters (setpoints) with FC6 / FC16 / FC23. Instead of
+# polling the datablock for changes, the host subscribes:
+#
+#   mb.onWrite(lambda changes: print(changes))            # every parameter
+#   mb.onWrite(setpointQueue, range(100, 120))            # a queue.Queue gets the dicts
+#
+# The request handler (handlers.py) reports each successful write once the
+# registers are published. On the server loop that only decodes the touched
+# parameters (FLOAT32 ABCD at the registersPerParam stride, or per the registerMap)
+# and merges them into one pending {paramIndex: float}, newest value wins. A
+# dispatcher thread hands the pending batch to the subscribers, each getting only
+# its own range; while a callback runs, further writes keep coalescing, so a slow
+# callback delays its own next batch but never a Modbus response.
+#
+# Updates from the host (update(), ingest) are not reported. Worker processes
+# (runWorkers) serve read-only and see no writes.
+
+from array import array
+from bisect import bisect_right
+from threading import Event, Lock, Thread
+from codec import decodeRegisters
+
+floatRegisters = 2
+writeCodes = (6, 16, 23)
+
+class WriteNotifier:
+    def __init__(self, mb):
+        self.mb = mb
+        self.subscriptions = []         # [(callback, start, stop)] over parameter indices
+        self.lock = Lock()
+        self.changes = {}               # pending {paramIndex: float}
+        self.pending = Event()
+        self.stopping = False
+        self.worker = None
+        self.units = {}                 # unit → (shard addresses, HR shards) for bisect
+        for shard in mb.shardMap.shards:
+            if shard.bank == "HR":
+                self.units.setdefault(shard.unit, []).append(shard)
+        for unit, shards in self.units.items():
+            shards.sort(key=lambda shard: shard.address)
+            self.units[unit] = ([shard.address for shard in shards], shards)
+        self.writes = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.callbackErrors = 0
+
+    # ---------------- subscriptions (host thread) ----------------
+    def subscribe(self, callback, paramRange=None):
+        # paramRange: range or (start, stop) of 0-based parameter indices; None = all
+        if paramRange is None:
+            start, stop = 0, self.mb.numParams
+        elif isinstance(paramRange, range):
+            start, stop = paramRange.start, paramRange.stop
+        else:
+            start, stop = paramRange
+        with self.lock:
+            self.subscriptions.append((callback, start, stop))
+        self.startWorker()
+
+    def startWorker(self):
+        # On the first subscription, and again on the first write after stop()
+        # (mb.stop(); mb.runServer() keeps the subscriptions). The dispatcher clears
+        # self.worker under the lock as it exits, so a thread still draining (stop()
+        # timed out on a slow callback) is kept running instead of getting a twin.
+        with self.lock:
+            self.stopping = False
+            if self.worker is None:
+                self.worker = Thread(target=self.run, daemon=True, name="modbusinator-writeback")
+                self.worker.start()
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions if s[0] is not callback]
+
+    # ---------------- capture (server loop) ----------------
+    def written(self, unit, address, registers):
+        # A client write of registers at address (0-based) on unit has been published
+        if not self.subscriptions:
+            return
+        units = self.units.values() if unit == 0 else [self.units[unit]] if unit in self.units else ()
+        decoded = {}
+        stop = address + len(registers)
+        for starts, shards in units:
+            n = max(bisect_right(starts, address) - 1, 0)
+            for shard in shards[n:]:
+                if shard.address >= stop:
+                    break
+                if shard.stopAddress <= address:
+                    continue
+                decoded.update(self.decode(shard, max(address, shard.address), min(stop, shard.stopAddress)))
+        if not decoded:
+            return
+        if self.worker is None or self.stopping:
+            self.startWorker()
+        with self.lock:
+            self.writes += 1
+            if self.changes:
+                self.coalesced += 1
+            self.changes.update(decoded)
+            self.pending.set()
+
+    def decode(self, shard, low, high):
+        # Parameters whose registers overlap [low, high), read back as published
+        registerMap = self.mb.registerMap
+        if registerMap is not None:
+            return self.decodeMapped(registerMap, shard, low, high)
+        stride = shard.stride
+        first = (low - shard.address) // stride
+        if (low - shard.address) % stride >= floatRegisters:
+            first += 1          # only padding registers of the first parameter were written
+        last = (high - 1 - shard.address) // stride
+        if last < first:
+            return {}
+        count = last - first + 1
+        regs = shard.context.getValues(shard.funcCode, shard.address + first * stride, count * stride)
+        if not isinstance(regs, array):
+            regs = array('H', regs)
+        values = decodeRegisters(regs, "FLOAT32", "ABCD", stride=stride)
+        return dict(zip(range(shard.firstParam + first, shard.firstParam + first + count), values))
+
+    def decodeMapped(self, registerMap, shard, low, high):
+        indices = registerMap.overlapping(low - shard.address, high - shard.address)
+        if not indices:
+            return {}
+        first = min(registerMap.addresses[i] for i in indices)
+        stop = max(registerMap.addresses[i] + registerMap.widths[i] for i in indices)
+        regs = shard.context.getValues(shard.funcCode, shard.address + first, stop - first)
+        decoded = {}
+        for i in indices:
+            start = registerMap.addresses[i] - first
+            decoded[i] = registerMap.decode(i, regs[start:start + registerMap.widths[i]])
+        return decoded
+
+    # ---------------- delivery (dispatcher thread) ----------------
+    def take(self):
+        with self.lock:
+            changes, self.changes = self.changes, {}
+            self.pending.clear()
+            return changes, list(self.subscriptions)
+
+    def run(self):
+        while True:
+            self.pending.wait()
+            changes, subscriptions = self.take()
+            if changes:
+                self.deliver(changes, subscriptions)
+            with self.lock:
+                # stop() may have set pending while a callback ran and take() consumed
+                # that wake-up: exit here once nothing is left, not in pending.wait()
+                if self.stopping and not self.changes:
+                    self.worker = None
+                    return
+
+    def deliver(self, changes, subscriptions):
+        self.batches += 1
+        for callback, start, stop in subscriptions:
+            batch = {i: v for i, v in changes.items() if start <= i < stop}
+            if not batch:
+                continue
+            try:
+                put = getattr(callback, "put_nowait", None)
+                if put is not None:
+                    put(batch)
+                else:
+                    callback(batch)
+            except Exception as e:
+                self.callbackErrors += 1
+                self.mb.log('ERROR', f"MODBUSINATOR onWrite callback error: {e}")
+
+    def stop(self):
+        # Deliver whatever is still pending, then stop the dispatcher (it clears
+        # self.worker itself; after a timeout it is left to finish its callback)
+        worker = self.worker
+        self.stopping = True
+        self.pending.set()
+        if worker is not None:
+            worker.join(timeout=5)
+
+    def stats(self):
+        return {
+            "subscriptions": len(self.subscriptions),
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "callbackErrors": self.callbackErrors,
+        }